@@ -0,0 +1,22 @@
+#granting and revoking admin rights (flask set-admin); is_admin is never
+#writable over the API
+import click
+
+from auth import invalidate_user
+from config import app, db
+from models import User
+
+
+@app.cli.command('set-admin')
+@click.argument('username')
+@click.option('--revoke', is_flag=True, help='Take admin rights away instead.')
+def set_admin(username, revoke):
+    """Grant USERNAME admin rights (exports, profiles, other users' accounts)."""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f'No user named {username}')
+    user.is_admin = not revoke
+    db.session.commit()
+    # Other running workers pick the change up within USER_CACHE_TTL
+    invalidate_user(user.id)
+    print(f"{username} is {'no longer' if revoke else 'now'} an admin")
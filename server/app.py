@@ -1,10 +1,29 @@
 from flask import request, session, jsonify
 from flask_restful import Resource
 from flask_cors import CORS
+from sqlalchemy.orm import selectinload
 import json
+from functools import partial
 
 from config import app, db, api
 from models import User, Product, Category, Subcategory, ProductCategory, Order
+from pagination import PaginationError, keyset_page, order_by_keys, wants_page
+from cache import cached_response
+from etags import CATEGORY_SCOPES, CATEGORY_TREE_SCOPES, PRODUCT_SCOPES, conditional_get
+from inventory import OutOfStock, build_order_items, release_inventory, reserve_inventory
+from product_import import import_products, read_rows
+from product_bulk import BulkUpdateError, parse_updates, update_products
+from export import EXPORTS, ndjson_export, parse_since
+from auth import invalidate_user, is_admin_session, session_user
+from hashing import HashingBusy
+from category_tree import build_category_tree
+from facets import product_facets
+from product_filters import FilterError, filter_products, sort_keys
+from multi_get import IdsError, parse_ids, products_by_id
+from serializers import FieldsError, requested_fields, select_products, serialize_products
+import instrumentation  # noqa: F401  Server-Timing header and slow query log
+import metrics  # noqa: F401  /metrics
+from profiling import ProfileNotFound, load_stats, render, saved_profiles
 
 # Configure CORS to allow credentials and specify the origins
 CORS(app, supports_credentials=True, origins=["http://localhost:3000", "http://localhost:3003"])
@@ -16,7 +35,13 @@ def index():
 
 # User Routes
 class Users(Resource):
+    @conditional_get('users')
     def get(self):
+        if wants_page():
+            try:
+                return keyset_page(User.query, [(User.id, False)], User.to_dict), 200
+            except PaginationError as e:
+                return {'error': str(e)}, 400
         users = [user.to_dict() for user in User.query.all()]
         return users, 200
 
@@ -31,12 +56,29 @@ class Users(Resource):
             new_user.password_hash = data['password']
             db.session.add(new_user)
             db.session.commit()
+            invalidate_user(new_user.id)
             session['user_id'] = new_user.id
             return new_user.to_dict(), 201
+        except HashingBusy as e:
+            return {'error': str(e)}, 503, {'Retry-After': '1'}
         except Exception as e:
             return {'error': str(e)}, 400
 
+# Columns a user may change on an account; the password goes through the
+# hashing setter and is_admin is never writable over the API
+USER_FIELDS = ('username', 'email', 'address')
+
+def check_user_access(id, action):
+    # The account's owner or an admin; returns an error response otherwise
+    user_id = session.get('user_id')
+    if not user_id:
+        return {'error': f'You must be logged in to {action} users'}, 401
+    if user_id != id and not is_admin_session():
+        return {'error': f'You do not have permission to {action} this user'}, 403
+    return None
+
 class UserById(Resource):
+    @conditional_get('users')
     def get(self, id):
         user = User.query.filter_by(id=id).first()
         if not user:
@@ -44,24 +86,41 @@ class UserById(Resource):
         return user.to_dict(), 200
 
     def patch(self, id):
+        error = check_user_access(id, 'edit')
+        if error:
+            return error
         user = User.query.filter_by(id=id).first()
         if not user:
             return {'error': 'User not found'}, 404
-        data = request.get_json()
-        for attr in data:
-            if attr == 'password':
-                user.password_hash = data[attr]
-            elif hasattr(user, attr):
-                setattr(user, attr, data[attr])
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return {'error': 'Body must be a JSON object'}, 400
+        readonly = set(data) - set(USER_FIELDS) - {'password'}
+        if readonly:
+            return {'error': f'Field(s) cannot be changed: {", ".join(sorted(readonly))}'}, 400
+        try:
+            for attr in data:
+                if attr == 'password':
+                    user.password_hash = data[attr]
+                else:
+                    setattr(user, attr, data[attr])
+        except HashingBusy as e:
+            db.session.rollback()
+            return {'error': str(e)}, 503, {'Retry-After': '1'}
         db.session.commit()
+        invalidate_user(user.id)
         return user.to_dict(), 200
 
     def delete(self, id):
+        error = check_user_access(id, 'delete')
+        if error:
+            return error
         user = User.query.filter_by(id=id).first()
         if not user:
             return {'error': 'User not found'}, 404
         db.session.delete(user)
         db.session.commit()
+        invalidate_user(id)
         return '', 204
 
 # Authentication Routes
@@ -69,8 +128,16 @@ class Login(Resource):
     def post(self):
         data = request.get_json()
         user = User.query.filter_by(username=data.get('username')).first()
-        if not user or not user.check_password(data.get('password')):
-            return {'error': 'Invalid username or password'}, 401
+        try:
+            if not user or not user.check_password(data.get('password')):
+                return {'error': 'Invalid username or password'}, 401
+            # Upgrade hashes made with an older method while we have the password
+            if user.password_needs_rehash():
+                user.password_hash = data.get('password')
+                db.session.commit()
+        except HashingBusy as e:
+            db.session.rollback()
+            return {'error': str(e)}, 503, {'Retry-After': '1'}
         session['user_id'] = user.id
         return user.to_dict(), 200
 
@@ -80,47 +147,61 @@ class Logout(Resource):
         return {}, 204
 
 class CheckSession(Resource):
+    # Served from the session user cache, so no DB round trip (and no ETag
+    # check, which would need one) once the user is cached
     def get(self):
-        user_id = session.get('user_id')
-        if not user_id:
+        if not session.get('user_id'):
             return {'error': 'Not authorized'}, 401
-        user = User.query.filter_by(id=user_id).first()
+        user = session_user()
         if not user:
             return {'error': 'User not found'}, 404
-        return user.to_dict(), 200
+        return user, 200
 
 # Product Routes
 class Products(Resource):
+    @conditional_get(*PRODUCT_SCOPES)
+    @cached_response(*PRODUCT_SCOPES)
     def get(self):
-        category_name = request.args.get('category')
-        subcategory_name = request.args.get('subcategory')
-        search_term = request.args.get('search')
-        
-        # Start with all products
-        query = Product.query
-        
-        # Filter by category if specified
-        if category_name and category_name != 'All':
-            category = Category.query.filter_by(name=category_name).first()
-            if category:
-                product_ids = [pc.product_id for pc in category.product_categories]
-                query = query.filter(Product.id.in_(product_ids))
+        try:
+            fields = requested_fields(request.args.get('fields'))
+        except FieldsError as e:
+            return {'error': str(e)}, 400
         
-        # Filter by subcategory if specified
-        if subcategory_name:
-            subcategory = Subcategory.query.filter_by(name=subcategory_name).first()
-            if subcategory:
-                query = query.filter(Product.subcategory_id == subcategory.id)
+        # ?ids= fetches those products, keyed by id, instead of a listing
+        if 'ids' in request.args:
+            try:
+                ids = parse_ids(request.args['ids'])
+            except IdsError as e:
+                return {'error': str(e)}, 400
+            return products_by_id(ids, fields, request.args.get('fields')), 200
         
-        # Filter by search term if specified
-        if search_term:
-            query = query.filter(
-                Product.name.ilike(f'%{search_term}%') | 
-                Product.description.ilike(f'%{search_term}%')
-            )
+        try:
+            keys = sort_keys()
+            # Start with all products, most relevant search matches first
+            # unless another order was asked for (pages are always ordered
+            # by their sort keys so the cursor stays stable)
+            query = filter_products(Product.query, ranked=not wants_page() and 'sort' not in request.args)
+        except FilterError as e:
+            return {'error': str(e)}, 400
         
+        # Read plain rows for just the requested columns rather than ORM
+        # objects; subcategory and category lookups only run when asked for.
+        # Sort columns are always read since the cursor is built from them.
+        query = select_products(query, fields)
+        query = query.add_columns(*[column.label(column.key) for column, _ in keys if column.key not in fields])
+
+        # Return a page when limit/cursor is given, otherwise every match
+        if wants_page():
+            try:
+                serialize = partial(serialize_products, fields=fields)
+                return keyset_page(query, keys, serialize, many=True), 200
+            except PaginationError as e:
+                return {'error': str(e)}, 400
+
         # Get all filtered products
-        products = [product.to_dict() for product in query.all()]
+        if 'sort' in request.args:
+            query = query.order_by(*order_by_keys(keys))
+        products = serialize_products(query.all(), fields)
         return products, 200
     
     def post(self):
@@ -149,7 +230,7 @@ class Products(Resource):
             db.session.commit()
             
             if 'categories' in data:
-                for category_id in data['categories']:
+                for category_id in dict.fromkeys(data['categories']):
                     category = Category.query.get(category_id)
                     if category:
                         product_category = ProductCategory(
@@ -165,12 +246,57 @@ class Products(Resource):
         except Exception as e:
             return {'error': str(e)}, 400
 
+class ProductFacets(Resource):
+    @conditional_get(*PRODUCT_SCOPES)
+    @cached_response(*PRODUCT_SCOPES)
+    def get(self):
+        # Counts cover the products the same filters would list
+        try:
+            product_ids = filter_products(Product.query).with_entities(Product.id)
+        except FilterError as e:
+            return {'error': str(e)}, 400
+        return product_facets(product_ids), 200
+
+class ProductImport(Resource):
+    def post(self):
+        user_id = session.get('user_id')
+        if not user_id:
+            return {'error': 'You must be logged in to import products'}, 401
+        try:
+            batch_size = int(request.args.get('batch_size', app.config['IMPORT_BATCH_SIZE']))
+        except ValueError:
+            return {'error': 'batch_size must be an integer'}, 400
+        batch_size = max(1, min(batch_size, app.config['IMPORT_BATCH_SIZE_MAX']))
+
+        # Rows are parsed from the request stream as they arrive
+        rows = read_rows(request.stream, request.content_type or '')
+        report = import_products(rows, user_id, batch_size)
+        report['failed'] = len(report['errors'])
+        return report, 200
+
+class ProductBulkUpdate(Resource):
+    def patch(self):
+        user_id = session.get('user_id')
+        if not user_id:
+            return {'error': 'You must be logged in to edit products'}, 401
+        try:
+            items = parse_updates(request.get_json(silent=True), app.config['BULK_UPDATE_MAX_ITEMS'])
+        except BulkUpdateError as e:
+            return {'error': str(e)}, 400
+        return update_products(items, user_id), 200
+
 class ProductById(Resource):
+    @conditional_get(*PRODUCT_SCOPES)
+    @cached_response(*PRODUCT_SCOPES)
     def get(self, id):
-        product = Product.query.filter_by(id=id).first()
-        if not product:
+        try:
+            fields = requested_fields(request.args.get('fields'))
+        except FieldsError as e:
+            return {'error': str(e)}, 400
+        products = serialize_products(select_products(Product.query.filter(Product.id == id), fields).all(), fields)
+        if not products:
             return {'error': 'Product not found'}, 404
-        return product.to_dict(), 200
+        return products[0], 200
     
     def patch(self, id):
         product = Product.query.filter_by(id=id).first()
@@ -194,7 +320,7 @@ class ProductById(Resource):
         
         if 'categories' in data:
             ProductCategory.query.filter_by(product_id=product.id).delete()
-            for category_id in data['categories']:
+            for category_id in dict.fromkeys(data['categories']):
                 category = Category.query.get(category_id)
                 if category:
                     product_category = ProductCategory(
@@ -220,8 +346,11 @@ class ProductById(Resource):
 
 # Category Routes
 class Categories(Resource):
+    @conditional_get(*CATEGORY_SCOPES)
+    @cached_response(*CATEGORY_SCOPES)
     def get(self):
-        categories = [category.to_dict() for category in Category.query.all()]
+        query = Category.query.options(selectinload(Category.subcategories))
+        categories = [category.to_dict() for category in query]
         return categories, 200
     
     def post(self):
@@ -237,7 +366,16 @@ class Categories(Resource):
         except Exception as e:
             return {'error': str(e)}, 400
 
+class CategoryTree(Resource):
+    # Rebuilt only when categories, subcategories or product links change;
+    # stock and other product edits don't move the counts
+    @conditional_get(*CATEGORY_TREE_SCOPES)
+    @cached_response(*CATEGORY_TREE_SCOPES)
+    def get(self):
+        return build_category_tree(), 200
+
 class CategoryById(Resource):
+    @conditional_get(*CATEGORY_SCOPES)
     def get(self, id):
         category = Category.query.filter_by(id=id).first()
         if not category:
@@ -265,6 +403,8 @@ class CategoryById(Resource):
 
 # Subcategory Routes
 class Subcategories(Resource):
+    @conditional_get('subcategories')
+    @cached_response('subcategories')
     def get(self):
         subcategories = [subcategory.to_dict() for subcategory in Subcategory.query.all()]
         return subcategories, 200
@@ -283,6 +423,7 @@ class Subcategories(Resource):
             return {'error': str(e)}, 400
 
 class SubcategoryById(Resource):
+    @conditional_get('subcategories')
     def get(self, id):
         subcategory = Subcategory.query.filter_by(id=id).first()
         if not subcategory:
@@ -345,11 +486,19 @@ class ProductCategoryById(Resource):
 
 # Order Routes
 class Orders(Resource):
+    @conditional_get('orders:{user_id}')
     def get(self):
         user_id = session.get('user_id')
         if not user_id:
             return {'error': 'You must be logged in to view orders'}, 401
-        orders = [order.to_dict() for order in Order.query.filter_by(user_id=user_id)]
+        query = Order.query.options(selectinload(Order.items)).filter_by(user_id=user_id)
+        if wants_page():
+            try:
+                keys = [(Order.created_at, False), (Order.id, False)]
+                return keyset_page(query, keys, Order.to_dict), 200
+            except PaginationError as e:
+                return {'error': str(e)}, 400
+        orders = [order.to_dict() for order in query]
         return orders, 200
     
     def post(self):
@@ -358,23 +507,30 @@ class Orders(Resource):
             return {'error': 'You must be logged in to create an order'}, 401
         data = request.get_json()
         try:
+            items = build_order_items(data.get('items', []))
             new_order = Order(
                 user_id=user_id,
                 status='pending',
-                total_amount=data['total_amount'],
+                total_amount=data.get('total_amount', sum(item.unit_price * item.quantity for item in items)),
                 shipping_address=data.get('shipping_address', ''),
+                items=items,
             )
-            if 'items' in data:
-                new_order.set_items(data['items'])
             db.session.add(new_order)
+            # The order, its items and the stock decrements commit together
+            reserve_inventory(items)
             db.session.commit()
             return new_order.to_dict(), 201
+        except OutOfStock as e:
+            db.session.rollback()
+            return {'error': str(e), 'product_id': e.product_id}, 409
         except Exception as e:
+            db.session.rollback()
             return {'error': str(e)}, 400
 
 class OrderById(Resource):
+    @conditional_get('orders:{user_id}')
     def get(self, id):
-        order = Order.query.filter_by(id=id).first()
+        order = Order.query.options(selectinload(Order.items)).filter_by(id=id).first()
         if not order:
             return {'error': 'Order not found'}, 404
         user_id = session.get('user_id')
@@ -390,17 +546,82 @@ class OrderById(Resource):
         if not user_id or order.user_id != user_id:
             return {'error': 'You do not have permission to update this order'}, 403
         data = request.get_json()
-        if 'status' in data:
-            order.status = data['status']
-        if 'shipping_address' in data:
-            order.shipping_address = data['shipping_address']
-        if 'total_amount' in data:
-            order.total_amount = data['total_amount']
-        if 'items' in data:
-            order.set_items(data['items'])
-        db.session.commit()
+        try:
+            if 'status' in data:
+                order.status = data['status']
+            if 'shipping_address' in data:
+                order.shipping_address = data['shipping_address']
+            if 'total_amount' in data:
+                order.total_amount = data['total_amount']
+            if 'items' in data:
+                # Put the old quantities back before reserving the new ones
+                items = build_order_items(data['items'])
+                release_inventory(order.items)
+                order.items = items
+                reserve_inventory(items)
+            db.session.commit()
+        except OutOfStock as e:
+            db.session.rollback()
+            return {'error': str(e), 'product_id': e.product_id}, 409
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 400
         return order.to_dict(), 200
 
+# Export Routes
+class Export(Resource):
+    def get(self, name):
+        if not is_admin_session():
+            return {'error': 'Only admins can export data'}, 403
+        if name not in EXPORTS:
+            return {'error': f'Unknown export {name}'}, 404
+        since = request.args.get('since')
+        try:
+            since = parse_since(since) if since else None
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return app.response_class(ndjson_export(name, since), mimetype='application/x-ndjson')
+
+# Profiling Routes
+class Profiles(Resource):
+    def get(self):
+        if not is_admin_session():
+            return {'error': 'Only admins can view profiles'}, 403
+        return saved_profiles(request.args.get('kind')), 200
+
+class ProfileDump(Resource):
+    def get(self, name):
+        if not is_admin_session():
+            return {'error': 'Only admins can view profiles'}, 403
+        try:
+            body, mimetype = render(load_stats([name]), request.args.get('format', 'pstats'))
+        except ProfileNotFound as e:
+            return {'error': str(e)}, 404
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return app.response_class(body, mimetype=mimetype)
+
+class ProfileAggregate(Resource):
+    def get(self):
+        # Sampled profiles merged into one, optionally for one resource/method
+        if not is_admin_session():
+            return {'error': 'Only admins can view profiles'}, 403
+        resource, method = request.args.get('resource'), request.args.get('method')
+        names = [
+            profile['name'] for profile in saved_profiles('sample')
+            if resource in (None, profile['resource']) and method in (None, profile['method'])
+        ]
+        if not names:
+            return {'error': 'No sampled profiles match'}, 404
+        try:
+            body, mimetype = render(load_stats(names), request.args.get('format', 'pstats'))
+        except ProfileNotFound as e:
+            # A sample was pruned between listing and loading
+            return {'error': str(e)}, 409
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return app.response_class(body, mimetype=mimetype)
+
 # Register resources
 api.add_resource(Users, '/users')
 api.add_resource(UserById, '/users/<int:id>')
@@ -409,14 +630,27 @@ api.add_resource(Logout, '/logout')
 api.add_resource(CheckSession, '/me')
 api.add_resource(Products, '/products')
 api.add_resource(ProductById, '/products/<int:id>')
+api.add_resource(ProductImport, '/products/import')
+api.add_resource(ProductBulkUpdate, '/products/bulk')
+api.add_resource(ProductFacets, '/products/facets')
 api.add_resource(Categories, '/categories')
 api.add_resource(CategoryById, '/categories/<int:id>')
+api.add_resource(CategoryTree, '/categories/tree')
 api.add_resource(Subcategories, '/subcategories')
 api.add_resource(SubcategoryById, '/subcategories/<int:id>')
 api.add_resource(ProductCategories, '/product_categories')
 api.add_resource(ProductCategoryById, '/product_categories/<int:id>')
 api.add_resource(Orders, '/orders')
 api.add_resource(OrderById, '/orders/<int:id>')
+api.add_resource(Export, '/export/<string:name>')
+api.add_resource(Profiles, '/profiles')
+api.add_resource(ProfileAggregate, '/profiles/aggregate')
+api.add_resource(ProfileDump, '/profiles/<string:name>')
+
+# CLI commands
+import query_plans  # noqa: E402,F401  flask check-query-plans
+import generate  # noqa: E402,F401  flask generate
+import admins  # noqa: E402,F401  flask set-admin
 
 if __name__ == '__main__':
     app.run(port=5555, debug=True)
\ No newline at end of file
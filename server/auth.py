@@ -0,0 +1,37 @@
+#session user helpers shared by the resources
+from flask import session
+
+from cache import MISSING, LRUCache
+from config import app
+from models import User
+
+# user_id -> serialized user. Ids without a user aren't cached, so a signup
+# is seen at once. Per process: Users.post and UserById.patch/delete
+# invalidate locally and the TTL bounds staleness in other workers.
+user_cache = LRUCache(app.config['USER_CACHE_MAX_ENTRIES'], app.config['USER_CACHE_TTL'])
+
+
+def session_user():
+    """The logged in user as a dict, served from user_cache when possible."""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    cached = user_cache.get(user_id)
+    if cached is not MISSING:
+        return cached
+    user = User.query.filter_by(id=user_id).first()
+    if not user:
+        return None
+    # is_admin is left out of the public to_dict; the user's own view has it
+    data = {**user.to_dict(), 'is_admin': user.is_admin}
+    user_cache.set(user_id, data)
+    return data
+
+
+def invalidate_user(user_id):
+    user_cache.delete(user_id)
+
+
+def is_admin_session():
+    user = session_user()
+    return bool(user and user['is_admin'])
@@ -0,0 +1,223 @@
+"""Latency, throughput and SQL statement counts per endpoint, measured
+through the Flask test client against a generated database.
+
+Each scale's database is built once with `flask generate` and cached in
+--data-dir; every run works on a fresh copy so writes don't accumulate.
+Results can be saved as a baseline and later runs fail (exit 1) when an
+endpoint's p50/p95 grows past --threshold or it issues more statements,
+or when there is no baseline for the scale.
+
+    python -m benchmarks.endpoints --scale 100k --save-baseline
+    python -m benchmarks.endpoints --scale 100k
+
+benchmarks/baselines.json holds the committed 1k baseline. Statement
+counts carry over between machines but latencies don't: save a baseline
+on the machine that runs the check before relying on its timings.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+from pagination import encode_cursor
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# flask generate arguments per scale, named for the product count
+SCALES = {
+    '1k': ['--users', '200', '--products', '1e3', '--orders', '2e3'],
+    '100k': ['--users', '1e4', '--products', '1e5', '--orders', '1e5'],
+    '1m': ['--users', '1e5', '--products', '1e6', '--orders', '1e6'],
+}
+
+DEFAULT_BASELINES = os.path.join(SERVER_DIR, 'benchmarks', 'baselines.json')
+
+
+class Context:
+    def __init__(self, rng, max_product, max_user):
+        self.rng = rng
+        self.max_product = max_product
+        self.max_user = max_user
+
+    def product_id(self):
+        return self.rng.randint(1, self.max_product)
+
+
+# name -> function building (method, path, json body) for one request
+SCENARIOS = {
+    'products_page': lambda ctx: ('GET', '/products?limit=50', None),
+    'products_deep_page': lambda ctx: ('GET', f'/products?limit=50&cursor={encode_cursor([ctx.product_id()])}', None),
+    'products_filtered': lambda ctx: ('GET', '/products?size=M&color=Black&max_price=50&sort=price&limit=50', None),
+    'products_search': lambda ctx: ('GET', '/products?search=hoodie&limit=20', None),
+    'products_facets': lambda ctx: ('GET', '/products/facets?size=M', None),
+    'product_by_id': lambda ctx: ('GET', f'/products/{ctx.product_id()}', None),
+    'categories': lambda ctx: ('GET', '/categories', None),
+    'orders_post': lambda ctx: ('POST', '/orders', {
+        'items': [{'product_id': ctx.product_id(), 'quantity': 1} for _ in range(ctx.rng.randint(1, 3))],
+    }),
+    'login': lambda ctx: ('POST', '/login', {'username': f'user{ctx.rng.randint(1, ctx.max_user)}', 'password': 'password'}),
+}
+
+
+def flask(args, database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', *args], cwd=SERVER_DIR, env=env, check=True)
+
+
+def prepared_database(scale, data_dir):
+    path = os.path.join(data_dir, f'bench-{scale}.db')
+    if not os.path.exists(path):
+        print(f'Generating the {scale} dataset in {path} ...')
+        partial = path + '.partial'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(partial + suffix):
+                os.remove(partial + suffix)
+        flask(['db', 'upgrade'], f'sqlite:///{partial}')
+        flask(['generate', *SCALES[scale]], f'sqlite:///{partial}')
+        # Fold the WAL back in so the cached file is complete on its own
+        with sqlite3.connect(partial) as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        os.rename(partial, path)
+    return path
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(client, db, build, ctx, requests, warmup, cached):
+    from cache import response_cache
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        latencies, sql, statuses = [], [], Counter()
+        for i in range(warmup + requests):
+            method, path, body = build(ctx)
+            if not cached:
+                response_cache.clear()
+            statements[0] = 0
+            start = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            elapsed = time.perf_counter() - start
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            sql.append(statements[0])
+            statuses[response.status_code] += 1
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'rps': round(len(latencies) / sum(latencies), 1),
+        'sql': statistics.median(sql),
+        'statuses': {str(status): n for status, n in sorted(statuses.items())},
+    }
+
+
+def regressions(results, baseline, threshold):
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if result[key] > base[key] * (1 + threshold):
+                found.append(f'{name}: {key} {result[key]} vs baseline {base[key]}')
+        if result['sql'] > base['sql']:
+            found.append(f'{name}: {result["sql"]} statements vs baseline {base["sql"]}')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', choices=SCALES, default='1k')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint.')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--only', nargs='*', choices=SCENARIOS, help='Endpoints to run (default all).')
+    parser.add_argument('--cached', action='store_true', help='Keep the response cache between requests.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'ecommerce-bench'))
+    parser.add_argument('--baselines', default=DEFAULT_BASELINES)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed latency growth (0.25 = 25%%).')
+    parser.add_argument('--json', help='Also write the results to this file.')
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    source = prepared_database(args.scale, args.data_dir)
+    work = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    shutil.copyfile(source, work)
+
+    # The app reads DATABASE_URL at import, so it is imported once the
+    # working copy is in place
+    os.environ['DATABASE_URL'] = f'sqlite:///{work}'
+    from app import app
+    from config import db
+    from models import Product, User
+
+    with app.app_context():
+        max_product = db.session.scalar(db.select(db.func.max(Product.id)))
+        max_user = db.session.scalar(db.select(db.func.max(User.id)))
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = max_user
+
+    results = {}
+    print(f'{"endpoint":<20}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}{"sql":>6}  statuses')
+    for name in args.only or SCENARIOS:
+        ctx = Context(random.Random(f'{args.seed}:{name}'), max_product, max_user)
+        with app.app_context():
+            result = measure(client, db, SCENARIOS[name], ctx, args.requests, args.warmup, args.cached)
+        results[name] = result
+        print(
+            f'{name:<20}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+            f'{result["rps"]:>9.0f}{result["sql"]:>6g}  {result["statuses"]}'
+        )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({args.scale: results}, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines.setdefault(args.scale, {}).update(results)
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f'Baseline for {args.scale} saved to {args.baselines}')
+        return
+
+    if args.scale not in baselines:
+        sys.exit(f'No {args.scale} baseline in {args.baselines}; run with --save-baseline to create one.')
+    found = regressions(results, baselines[args.scale], args.threshold)
+    for line in found:
+        print(f'REGRESSION {line}')
+    if found:
+        sys.exit(1)
+    print('No regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()
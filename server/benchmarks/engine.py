@@ -0,0 +1,107 @@
+"""Concurrent read/write throughput of the SQLite engine, with the driver's
+default settings and with the SQLITE_PRAGMAS from config.py.
+
+Readers fetch random products by id. Writers run a checkout shaped
+transaction: read a product, insert an order, decrement its inventory.
+
+    python -m benchmarks.engine --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine, exc, insert, select, update
+
+from config import app, configure_sqlite, db
+from models import Order, Product, User
+
+PRODUCTS = 10000
+
+
+def build_engine(path, pragmas):
+    engine = create_engine(f'sqlite:///{path}', pool_size=32, max_overflow=0)
+    if pragmas:
+        configure_sqlite(engine, pragmas)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{'username': 'bench', 'email': 'bench@example.com', '_password_hash': 'x'}])
+        conn.execute(insert(Product.__table__), [
+            {'name': f'Product {i}', 'price': 10.0, 'inventory_count': 10 ** 9, 'user_id': 1}
+            for i in range(PRODUCTS)
+        ])
+    return engine
+
+
+def reader(engine, stop, counts):
+    products = Product.__table__
+    rng = random.Random()
+    while not stop.is_set():
+        try:
+            with engine.connect() as conn:
+                conn.execute(select(products).where(products.c.id == rng.randint(1, PRODUCTS))).fetchone()
+            counts['reads'] += 1
+        except exc.OperationalError:
+            counts['read_errors'] += 1
+
+
+def writer(engine, stop, counts):
+    products, orders = Product.__table__, Order.__table__
+    rng = random.Random()
+    while not stop.is_set():
+        product_id = rng.randint(1, PRODUCTS)
+        try:
+            with engine.begin() as conn:
+                price = conn.execute(select(products.c.price).where(products.c.id == product_id)).scalar()
+                conn.execute(insert(orders), {'user_id': 1, 'total_amount': price, 'status': 'pending'})
+                conn.execute(
+                    update(products)
+                    .where(products.c.id == product_id)
+                    .values(inventory_count=products.c.inventory_count - 1)
+                )
+            counts['writes'] += 1
+        except exc.OperationalError:
+            counts['write_errors'] += 1
+
+
+def run(label, pragmas, readers, writers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(os.path.join(tmp, 'bench.db'), pragmas)
+        # One counter per thread, summed once they stop
+        per_thread = [Counter() for _ in range(readers + writers)]
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=reader if i < readers else writer, args=(engine, stop, per_thread[i]))
+            for i in range(readers + writers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        counts = sum(per_thread, Counter())
+
+    print(
+        f"{label:<10} reads/s {counts['reads'] / seconds:>9.0f}  writes/s {counts['writes'] / seconds:>7.0f}  "
+        f"locked errors {counts['read_errors'] + counts['write_errors']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    run('defaults', None, args.readers, args.writers, args.seconds)
+    run('pragmas', app.config['SQLITE_PRAGMAS'], args.readers, args.writers, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
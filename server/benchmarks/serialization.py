@@ -0,0 +1,84 @@
+"""Time the GET /products response body: ORM objects through to_dict and
+the stdlib encoder (the old path) against column rows through
+serialize_products and serializers.dumps.
+
+    python -m benchmarks.serialization --products 10000 --rounds 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+# Point the app at a scratch database before config is imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from sqlalchemy import insert  # noqa: E402
+
+from config import app, db  # noqa: E402
+from models import Category, Product, ProductCategory, Subcategory, User, product_listing_options  # noqa: E402
+from serializers import dumps, orjson, select_products, serialize_products  # noqa: E402
+
+
+def seed(products):
+    db.create_all()
+    db.session.execute(insert(User), [{'username': 'bench', 'email': 'bench@example.com', '_password_hash': 'x'}])
+    db.session.execute(insert(Category), [{'name': f'Category {i}'} for i in range(10)])
+    db.session.execute(insert(Subcategory), [{'name': f'Subcategory {i}', 'category_id': i % 10 + 1} for i in range(50)])
+    db.session.execute(insert(Product), [
+        {
+            'name': f'Product {i}',
+            'description': 'A product used to measure response serialization. ' * 3,
+            'price': 10.0 + i % 90,
+            'inventory_count': i % 100,
+            'image_url': f'https://example.com/images/{i}.jpg',
+            'available_sizes': json.dumps(['S', 'M', 'L', 'XL']),
+            'available_colors': json.dumps(['Black', 'White']),
+            'user_id': 1,
+            'subcategory_id': i % 50 + 1,
+        }
+        for i in range(products)
+    ])
+    db.session.execute(insert(ProductCategory), [
+        {'product_id': i + 1, 'category_id': i % 10 + 1, 'featured': False} for i in range(products)
+    ])
+    db.session.commit()
+
+
+def orm_body():
+    products = [product.to_dict() for product in Product.query.options(*product_listing_options())]
+    return json.dumps(products, indent=4).encode()
+
+
+def row_body():
+    return dumps(serialize_products(select_products(Product.query).all()))
+
+
+def best_of(fn, rounds):
+    times = []
+    for _ in range(rounds):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        body = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed(args.products)
+        print(f'{args.products} products, best of {args.rounds}, encoder: {"orjson" if orjson else "stdlib json"}')
+        baseline = None
+        for label, fn in (('orm', orm_body), ('rows', row_body)):
+            seconds, size = best_of(fn, args.rounds)
+            baseline = baseline or seconds
+            print(f'{label:<6} {seconds * 1000:>8.1f} ms  {size / 1024:>8.0f} KiB  x{baseline / seconds:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#in-process response cache for the catalog GET endpoints
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request
+from config import app, api
+from etags import request_versions
+
+MISSING = object()
+
+
+class LRUCache:
+    """Thread safe LRU cache with a per-entry TTL, a size cap and hit/miss counters."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+
+response_cache = LRUCache(
+    app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024),
+    app.config.get('RESPONSE_CACHE_TTL', 60),
+)
+
+# Cache keys include the versions of the scopes a response is built from,
+# as read from table_versions for the request's ETag, so a commit touching
+# one of them - in any worker - makes the older entries unreachable and LRU
+# eviction reclaims them.
+def cache_key(path, args, scopes):
+    return (tuple(request_versions(scopes)), path, tuple(sorted(args)))
+
+
+def request_cache_key(scopes):
+    return cache_key(request.path, request.args.items(multi=True), scopes)
+
+
+def cached_response(*scopes):
+    """Serve a Resource GET from response_cache, storing the serialized body
+    of successful responses. Entries are dropped when one of scopes changes.
+    Requests flagged g.bypass_cache (those being profiled) always run the
+    handler."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request_cache_key(scopes)
+            cached = MISSING if g.get('bypass_cache') else response_cache.get(key)
+            if cached is not MISSING:
+                body, status, mimetype = cached
+                return app.response_class(body, status=status, mimetype=mimetype)
+
+            result = view(*args, **kwargs)
+            data, status = result if isinstance(result, tuple) else (result, 200)
+            response = api.make_response(data, status)
+            if status == 200:
+                response_cache.set(key, (response.get_data(), status, response.mimetype))
+            return response
+        return wrapper
+    return decorator
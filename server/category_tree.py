@@ -0,0 +1,42 @@
+#category tree with product counts, built from a few aggregate queries
+from sqlalchemy import func, select
+
+from config import db
+from models import Category, Product, ProductCategory, Subcategory
+
+
+def build_category_tree():
+    """Return every category with its subcategories nested inside, each
+    node carrying its product count. Three statements whatever the size
+    of the catalog."""
+    category_counts = dict(db.session.execute(
+        select(ProductCategory.category_id, func.count())
+        .group_by(ProductCategory.category_id)
+    ).all())
+
+    subcategories = {}
+    for id, name, category_id, product_count in db.session.execute(
+        select(Subcategory.id, Subcategory.name, Subcategory.category_id, func.count(Product.id))
+        .outerjoin(Product, Product.subcategory_id == Subcategory.id)
+        .group_by(Subcategory.id)
+        .order_by(Subcategory.id)
+    ):
+        subcategories.setdefault(category_id, []).append({
+            'id': id,
+            'name': name,
+            'category_id': category_id,
+            'product_count': product_count,
+        })
+
+    return [
+        {
+            'id': id,
+            'name': name,
+            'description': description,
+            'product_count': category_counts.get(id, 0),
+            'subcategories': subcategories.get(id, []),
+        }
+        for id, name, description in db.session.execute(
+            select(Category.id, Category.name, Category.description).order_by(Category.id)
+        )
+    ]
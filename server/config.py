@@ -1,19 +1,96 @@
+import os
+
 from flask import Flask
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, event
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+#DATABASE_URL selects the database; SQLite in the instance folder by default
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'your_secret_key_here'  
-app.json.compact = False
+app.json.compact = True
+
+#page sizes for cursor paginated collections (?limit=&cursor=)
+app.config['PAGE_SIZE_DEFAULT'] = 50
+app.config['PAGE_SIZE_MAX'] = 500
+
+#in-process cache for catalog GET responses (see cache.py)
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = 1024
+app.config['RESPONSE_CACHE_TTL'] = 60
+
+#most ids accepted by one GET /products?ids= lookup
+app.config['MULTI_GET_MAX_IDS'] = 100
+
+#rows per transaction for POST /products/import (?batch_size= up to the max)
+app.config['IMPORT_BATCH_SIZE'] = 1000
+app.config['IMPORT_BATCH_SIZE_MAX'] = 10000
+
+#most updates accepted by one PATCH /products/bulk (one transaction)
+app.config['BULK_UPDATE_MAX_ITEMS'] = 1000
+
+#rows fetched per round trip by the streaming /export/<table> endpoints
+app.config['EXPORT_CHUNK_SIZE'] = 1000
+
+#upper bounds of the price ranges counted by GET /products/facets; the
+#last range is open ended
+app.config['FACET_PRICE_BUCKETS'] = [25, 50, 100, 200]
+
+#password hashing runs on a bounded process pool (see hashing.py); hashes
+#made with another method are upgraded on the user's next login
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'
+app.config['PASSWORD_HASH_WORKERS'] = 2
+app.config['PASSWORD_HASH_QUEUE_DEPTH'] = 32
+app.config['PASSWORD_HASH_TIMEOUT'] = 5
+
+#per process cache of session users for /me and admin checks (see auth.py)
+app.config['USER_CACHE_MAX_ENTRIES'] = 10000
+app.config['USER_CACHE_TTL'] = 30
+
+#per request timings in a Server-Timing header, and statements slower than
+#SLOW_QUERY_MS logged (bound values redacted) to the slow_queries logger,
+#written to SLOW_QUERY_LOG when set (see instrumentation.py)
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '1') == '1'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG')
+
+#cProfile dumps of single requests (an admin sending X-Profile: 1) and of 1
+#in PROFILE_SAMPLE_EVERY requests (0 turns sampling off). Samples are a
+#rolling buffer: the oldest are deleted past either limit (see profiling.py)
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+app.config['PROFILE_SAMPLE_EVERY'] = int(os.environ.get('PROFILE_SAMPLE_EVERY', 0))
+app.config['PROFILE_SAMPLE_MAX_FILES'] = int(os.environ.get('PROFILE_SAMPLE_MAX_FILES', 500))
+app.config['PROFILE_SAMPLE_MAX_BYTES'] = int(os.environ.get('PROFILE_SAMPLE_MAX_BYTES', 50 * 1024 * 1024))
+app.config['PROFILE_REQUEST_MAX_FILES'] = 50
+
+#pragmas applied to every new SQLite connection: WAL lets readers run
+#alongside the single writer, busy_timeout makes writers wait instead of
+#failing with 'database is locked'
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'cache_size': -64000,  # negative means KiB, so 64MB of page cache
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+#connection pool for server databases (Postgres etc.)
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+    }
 
 #Ensures consistent naming database constraints
 #Makes migrations more reliable
 metadata = MetaData(naming_convention={
+    "ix": "ix_%(column_0_label)s",
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
 })
 
@@ -21,13 +98,32 @@ metadata = MetaData(naming_convention={
 #easy way for app to interact with db using python
 db = SQLAlchemy(metadata=metadata)
 
+#keeps autogenerate from dropping tables that exist outside the models
+#(the products_fts search index and its FTS5 shadow tables)
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == 'table' and name.startswith('products_fts'))
+
 #sets up db migrations so we can update db schema
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, include_object=include_object)
 
 #connects db to flask app
 db.init_app(app)
 
 
+def configure_sqlite(engine, pragmas):
+    #runs the pragmas on each connection as the pool opens it
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        configure_sqlite(db.engine, app.config['SQLITE_PRAGMAS'])
+
+
 #sets up Flask-RESTful for creating api endpoints
 api = Api(app)
 
@@ -0,0 +1,144 @@
+#ETag / If-None-Match support driven by per-table version counters
+import hashlib
+from functools import wraps
+
+from flask import g, request, session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from config import app, api, db
+from models import Order, OrderItem, Product, TableVersion
+
+# Scopes each catalog GET response is built from. Stock levels have their
+# own scope so checkouts only invalidate responses that show them, and the
+# category tree leaves out products: its subcategory counts follow product
+# membership, which bumps 'subcategory_counts' (see product_scopes).
+PRODUCT_SCOPES = ('products', 'inventory', 'product_categories', 'product_attributes', 'categories', 'subcategories')
+CATEGORY_SCOPES = ('categories', 'subcategories')
+CATEGORY_TREE_SCOPES = ('categories', 'subcategories', 'subcategory_counts', 'product_categories')
+
+INVENTORY_COLUMNS = {'inventory_count'}
+
+# Orders are versioned per buyer so checkouts by different users don't
+# contend on one counter row, and one user's order doesn't change another's ETag
+SCOPE_RESOLVERS = {
+    Order: lambda order: f'orders:{order.user_id}',
+    OrderItem: lambda item: f'orders:{item.order.user_id}' if item.order else 'orders',
+}
+
+BUMP_VERSIONS = text(
+    'INSERT INTO table_versions (scope, version) VALUES (:scope, 1) '
+    'ON CONFLICT (scope) DO UPDATE SET version = table_versions.version + 1'
+)
+
+
+def product_scopes(changed=None):
+    """Scopes to bump for a product write. changed is the set of columns an
+    update touches, None for inserts and deletes."""
+    if changed is not None and not changed:
+        return set()
+    if changed is not None and changed <= INVENTORY_COLUMNS:
+        return {'inventory'}
+    if changed is None or 'subcategory_id' in changed:
+        return {'products', 'subcategory_counts'}
+    return {'products'}
+
+
+def scopes_for(obj, session):
+    if isinstance(obj, Product):
+        if obj in session.new or obj in session.deleted:
+            return product_scopes()
+        state = inspect(obj)
+        return product_scopes({attr.key for attr in state.attrs if attr.history.has_changes()})
+    resolver = SCOPE_RESOLVERS.get(type(obj))
+    return {resolver(obj) if resolver else obj.__tablename__}
+
+
+def bump_versions(connection, scopes):
+    """Increment the version of each scope inside the caller's transaction."""
+    if scopes:
+        connection.execute(BUMP_VERSIONS, [{'scope': scope} for scope in sorted(scopes)])
+
+
+# Versions are bumped in the same transaction as the write, so every worker
+# process sees them change exactly when the data does
+@event.listens_for(Session, 'after_flush')
+def bump_flushed_versions(session, flush_context):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    scopes = set()
+    for obj in changed:
+        if not isinstance(obj, TableVersion):
+            scopes |= scopes_for(obj, session)
+    bump_versions(session.connection(), scopes)
+
+
+# Statements name their scopes with execution_options(version_scopes=...)
+# when they can be narrower than their tables; product statements default
+# to also bumping 'subcategory_counts' since they may change membership
+@event.listens_for(Session, 'do_orm_execute')
+def bump_statement_versions(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    scopes = orm_execute_state.execution_options.get('version_scopes')
+    if scopes is None:
+        scopes = set()
+        for mapper in orm_execute_state.all_mappers:
+            scopes |= product_scopes() if mapper.class_ is Product else {mapper.local_table.name}
+    bump_versions(orm_execute_state.session.connection(), scopes)
+
+
+def current_versions(scopes):
+    rows = db.session.query(TableVersion.scope, TableVersion.version).filter(TableVersion.scope.in_(scopes))
+    versions = dict(rows)
+    return [(scope, versions.get(scope, 0)) for scope in scopes]
+
+
+def request_versions(scopes):
+    """The versions conditional_get read for this request's ETag when it
+    covered the same scopes, so the response cache key (see cache.py) is
+    built from the same snapshot; otherwise read them now."""
+    read = g.get('scope_versions')
+    if read is not None and read[0] == tuple(scopes):
+        return read[1]
+    return current_versions(scopes)
+
+
+def compute_etag(versions, per_user):
+    parts = [request.full_path]
+    if per_user:
+        parts.append(f"user={session.get('user_id')}")
+    parts += [f'{scope}={version}' for scope, version in versions]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:20]
+
+
+def conditional_get(*scopes, per_user=False):
+    """Answer a Resource GET with 304 when If-None-Match carries the current
+    ETag, computed from the version counters of the given scopes without
+    running the handler. '{user_id}' in a scope is filled from the session,
+    and per_user tags responses that depend on who is logged in."""
+    per_user = per_user or any('{user_id}' in scope for scope in scopes)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            resolved = [scope.format(user_id=session.get('user_id')) for scope in scopes]
+            versions = current_versions(resolved)
+            g.scope_versions = (tuple(resolved), versions)
+            etag = compute_etag(versions, per_user)
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+
+            result = view(*args, **kwargs)
+            if isinstance(result, app.response_class):
+                response = result
+            else:
+                data, status = result if isinstance(result, tuple) else (result, 200)
+                response = api.make_response(data, status)
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+#streaming NDJSON export of whole tables for the warehouse sync
+import json
+from datetime import datetime
+
+from flask import current_app, stream_with_context
+from sqlalchemy.orm import selectinload
+
+from config import db
+from models import Order, Product, User, product_listing_options
+
+
+# Exportable tables: name -> (model, base query with its eager loads)
+EXPORTS = {
+    'products': (Product, lambda: Product.query.options(*product_listing_options())),
+    'orders': (Order, lambda: Order.query.options(selectinload(Order.items))),
+    'users': (User, lambda: User.query),
+}
+
+
+def parse_since(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError('since must be an ISO 8601 timestamp')
+
+
+def ndjson_export(name, since=None):
+    """Build a streaming response body for the named table. Rows are read in
+    keyset chunks of EXPORT_CHUNK_SIZE, so memory stays flat whatever the
+    table size. Each chunk is read in its own transaction, so no connection
+    is held while the client reads."""
+    model, base_query = EXPORTS[name]
+    query = base_query().order_by(model.id)
+    if since is not None:
+        query = query.filter(model.created_at >= since)
+    chunk_size = current_app.config.get('EXPORT_CHUNK_SIZE', 1000)
+
+    def generate():
+        last_id = 0
+        while True:
+            rows = query.filter(model.id > last_id).limit(chunk_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            lines = ''.join(json.dumps(row.to_dict(), separators=(',', ':')) + '\n' for row in rows)
+            # End the read transaction, returning the connection to the pool
+            # while the client reads, and drop the chunk from the identity
+            # map before fetching the next
+            db.session.rollback()
+            db.session.expunge_all()
+            yield lines
+
+    return stream_with_context(generate())
@@ -0,0 +1,61 @@
+#filter sidebar counts for GET /products/facets
+from sqlalchemy import case, func, select
+
+from config import app, db
+from models import Category, Product, ProductAttribute, ProductCategory, Subcategory
+
+
+def value_counts(statement):
+    return [{'value': value, 'count': count} for value, count in db.session.execute(statement)]
+
+
+def attribute_counts(kind, product_ids):
+    return value_counts(
+        select(ProductAttribute.value, func.count())
+        .where(ProductAttribute.kind == kind, ProductAttribute.product_id.in_(product_ids))
+        .group_by(ProductAttribute.value)
+        .order_by(ProductAttribute.value)
+    )
+
+
+def price_counts(product_ids):
+    bounds = app.config['FACET_PRICE_BUCKETS']
+    bucket = case(
+        *[(Product.price < bound, index) for index, bound in enumerate(bounds)],
+        else_=len(bounds),
+    )
+    counts = dict(db.session.execute(
+        select(bucket, func.count()).where(Product.id.in_(product_ids)).group_by(bucket)
+    ).all())
+    edges = [0] + bounds + [None]
+    return [
+        {'min': edges[index], 'max': edges[index + 1], 'count': counts.get(index, 0)}
+        for index in range(len(bounds) + 1)
+    ]
+
+
+def product_facets(product_ids):
+    """Counts per category, subcategory, size, color and price range over the
+    products selected by product_ids, a SELECT of product ids. Each facet is
+    one GROUP BY statement, so nothing is counted in Python."""
+    return {
+        'category': value_counts(
+            select(Category.name, func.count())
+            .join(ProductCategory, ProductCategory.category_id == Category.id)
+            .where(ProductCategory.product_id.in_(product_ids))
+            .group_by(Category.name)
+            .order_by(Category.name)
+        ),
+        # Subcategory names repeat across categories and are filtered on by
+        # name, so they are counted by name too
+        'subcategory': value_counts(
+            select(Subcategory.name, func.count())
+            .join(Product, Product.subcategory_id == Subcategory.id)
+            .where(Product.id.in_(product_ids))
+            .group_by(Subcategory.name)
+            .order_by(Subcategory.name)
+        ),
+        'size': attribute_counts('size', product_ids),
+        'color': attribute_counts('color', product_ids),
+        'price': price_counts(product_ids),
+    }
@@ -0,0 +1,266 @@
+#synthetic catalog, users and orders for load testing (flask generate)
+import json
+import random
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+import click
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+
+from config import app, db
+from etags import bump_versions, product_scopes
+from models import (
+    Category, Order, OrderItem, Product, ProductAttribute, ProductCategory, Subcategory, User, attribute_rows,
+)
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+COLORS = ['Black', 'White', 'Grey', 'Navy', 'Blue', 'Red', 'Green', 'Brown', 'Beige', 'Pink']
+ADJECTIVES = ['Classic', 'Slim', 'Relaxed', 'Vintage', 'Everyday', 'Premium', 'Lightweight', 'Organic', 'Cropped', 'Oversized']
+NOUNS = ['Tee', 'Shirt', 'Hoodie', 'Jacket', 'Jeans', 'Chinos', 'Shorts', 'Dress', 'Sweater', 'Sneakers']
+WORDS = (
+    'soft cotton blend fit cut stitched durable breathable stretch fabric everyday wear casual '
+    'tailored warm layered washed brushed recycled comfort style season pocket seam finish'
+).split()
+
+# Lines per order: mostly one or two, occasionally ten
+ORDER_SIZE_WEIGHTS = list(accumulate([40, 25, 15, 8, 5, 3, 2, 1, 0.5, 0.5]))
+STATUSES = ['delivered', 'shipped', 'pending', 'cancelled']
+STATUS_WEIGHTS = list(accumulate([70, 10, 15, 5]))
+
+# Rows are dated over the past year
+HISTORY = timedelta(days=365)
+
+# Multiplier spreading popularity ranks over row positions, so popular rows
+# aren't all adjacent. It's prime, so it permutes any count below it.
+SCATTER = 2654435761
+
+
+def count(value):
+    """Click type for row counts that also accepts 1e6 style values."""
+    try:
+        number = float(value)
+    except ValueError:
+        raise click.BadParameter(f'{value!r} is not a number')
+    if number < 0 or number != int(number) or number >= SCATTER:
+        raise click.BadParameter(f'{value!r} is not a usable row count')
+    return int(number)
+
+
+def skewed(rng, n):
+    """Pick a position in range(n) with Zipf like popularity. Log-uniform
+    ranks put about two thirds of the picks on the top 1% of a million rows."""
+    rank = int((n + 1) ** rng.random()) - 1
+    return rank * SCATTER % n
+
+
+def next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def load_column(*columns):
+    # Compact typed arrays keep millions of ids and prices in a few MB
+    values = [array('d' if column.type.python_type is float else 'q') for column in columns]
+    for row in db.session.execute(select(*columns).order_by(columns[0]).execution_options(yield_per=100000)):
+        for target, value in zip(values, row):
+            target.append(value)
+    return values
+
+
+def write(batches):
+    """Insert each batch, a list of (table, rows), with one executemany per
+    table and one transaction per batch."""
+    counts = Counter()
+    for batch in batches:
+        with db.engine.begin() as conn:
+            for table, rows in batch:
+                if rows:
+                    conn.execute(table.insert(), rows)
+                    counts[table.name] += len(rows)
+    return counts
+
+
+def chunks(start, total, chunk_size):
+    for first in range(start, start + total, chunk_size):
+        yield range(first, min(first + chunk_size, start + total))
+
+
+def created(rng, now):
+    return now - timedelta(seconds=rng.randrange(int(HISTORY.total_seconds())))
+
+
+def user_batches(rng, total, chunk_size, now):
+    # Hashing is deliberately slow, so every generated user shares one
+    password_hash = generate_password_hash('password', app.config['PASSWORD_HASH_METHOD'])
+    for ids in chunks(next_id(User), total, chunk_size):
+        yield [(User.__table__, [
+            {
+                'id': id,
+                'username': f'user{id}',
+                'email': f'user{id}@example.com',
+                '_password_hash': password_hash,
+                'address': f'{rng.randint(1, 9999)} Market Street',
+                'is_admin': False,
+                'created_at': created(rng, now),
+            }
+            for id in ids
+        ])]
+
+
+def category_batches(total, per_category):
+    category_id, subcategory_id = next_id(Category), next_id(Subcategory)
+    categories, subcategories = [], []
+    for category in range(category_id, category_id + total):
+        categories.append({'id': category, 'name': f'Category {category}', 'description': ''})
+        for _ in range(per_category):
+            subcategories.append({'id': subcategory_id, 'name': f'Subcategory {subcategory_id}', 'category_id': category})
+            subcategory_id += 1
+    yield [(Category.__table__, categories), (Subcategory.__table__, subcategories)]
+
+
+def product_batches(rng, total, chunk_size, now):
+    sellers, = load_column(User.id)
+    subcategory_ids, category_ids = load_column(Subcategory.id, Subcategory.category_id)
+    all_categories, = load_column(Category.id)
+    if not sellers or not subcategory_ids:
+        raise click.ClickException('Products need existing users and subcategories')
+    # Sellers are a small slice of all users
+    seller_count = max(1, len(sellers) // 100)
+
+    for ids in chunks(next_id(Product), total, chunk_size):
+        products, links, attributes = [], [], []
+        for id in ids:
+            position = skewed(rng, len(subcategory_ids))
+            sizes = [size for size in SIZES if rng.random() < 0.6] or ['M']
+            colors = rng.sample(COLORS, rng.randint(1, 3))
+            products.append({
+                'id': id,
+                'name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {id}',
+                'description': ' '.join(rng.choices(WORDS, k=16)),
+                'price': round(min(max(rng.lognormvariate(3.6, 0.7), 1), 2000), 2),
+                'inventory_count': rng.randint(0, 500),
+                'image_url': f'https://example.com/images/{id}.jpg',
+                'available_sizes': json.dumps(sizes),
+                'available_colors': json.dumps(colors),
+                'user_id': sellers[rng.randrange(seller_count)],
+                'subcategory_id': subcategory_ids[position],
+                'created_at': created(rng, now),
+            })
+            product_categories = {category_ids[position]}
+            if rng.random() < 0.1:
+                product_categories.add(all_categories[rng.randrange(len(all_categories))])
+            links += [
+                {'product_id': id, 'category_id': category_id, 'featured': rng.random() < 0.05}
+                for category_id in sorted(product_categories)
+            ]
+            attributes += attribute_rows(id, sizes, colors)
+        yield [
+            (Product.__table__, products),
+            (ProductCategory.__table__, links),
+            (ProductAttribute.__table__, attributes),
+        ]
+
+
+def order_batches(rng, total, chunk_size, now):
+    buyers, = load_column(User.id)
+    product_ids, prices = load_column(Product.id, Product.price)
+    if not buyers or not product_ids:
+        raise click.ClickException('Orders need existing users and products')
+
+    item_id = next_id(OrderItem)
+    for ids in chunks(next_id(Order), total, chunk_size):
+        orders, items = [], []
+        for id in ids:
+            lines = rng.choices(range(1, 11), cum_weights=ORDER_SIZE_WEIGHTS)[0]
+            positions = {skewed(rng, len(product_ids)) for _ in range(lines)}
+            total_amount = 0
+            for position in positions:
+                quantity = rng.choices((1, 2, 3), cum_weights=(80, 95, 100))[0]
+                items.append({
+                    'id': item_id,
+                    'order_id': id,
+                    'product_id': product_ids[position],
+                    'quantity': quantity,
+                    'unit_price': prices[position],
+                    'size': rng.choice(SIZES),
+                    'color': rng.choice(COLORS),
+                })
+                item_id += 1
+                total_amount += prices[position] * quantity
+            orders.append({
+                'id': id,
+                'user_id': buyers[skewed(rng, len(buyers))],
+                'status': rng.choices(STATUSES, cum_weights=STATUS_WEIGHTS)[0],
+                'total_amount': round(total_amount, 2),
+                'shipping_address': f'{rng.randint(1, 9999)} Market Street',
+                'created_at': created(rng, now),
+            })
+        yield [(Order.__table__, orders), (OrderItem.__table__, items)]
+
+
+def report(label, counts, started):
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    detail = ', '.join(f'{count} {table}' for table, count in counts.items())
+    print(f'{label}: {detail or "nothing"} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):.0f} rows/s)')
+
+
+@app.cli.command('generate')
+@click.option('--users', type=count, default=1000, show_default=True)
+@click.option('--categories', type=count, default=20, show_default=True)
+@click.option('--subcategories', type=count, default=8, show_default=True, help='Per category.')
+@click.option('--products', type=count, default=10000, show_default=True)
+@click.option('--orders', type=count, default=20000, show_default=True)
+@click.option('--seed', type=int, default=1, show_default=True, help='Same seed and counts, same data.')
+@click.option('--chunk-size', type=count, default=10000, show_default=True, help='Rows per transaction.')
+def generate(users, categories, subcategories, products, orders, seed, chunk_size):
+    """Append synthetic users, categories, products and orders in bulk.
+
+    Counts accept 1e6 style values. Rows get explicit ids following the
+    existing ones, so generating into a fresh database is reproducible
+    (apart from the salt of the shared password hash, 'password').
+    """
+    # Dates are relative to a fixed day so reruns produce identical rows
+    now = datetime(2025, 1, 1)
+    # Each table has its own stream, so changing one count leaves the rows
+    # generated for the other tables unchanged
+    streams = {name: random.Random(f'{seed}:{name}') for name in ('users', 'products', 'orders')}
+    chunk_size = max(1, chunk_size)
+    first_order_id = next_id(Order)
+
+    steps = [
+        ('users', users, lambda: user_batches(streams['users'], users, chunk_size, now)),
+        ('categories', categories, lambda: category_batches(categories, subcategories)),
+        ('products', products, lambda: product_batches(streams['products'], products, chunk_size, now)),
+        ('orders', orders, lambda: order_batches(streams['orders'], orders, chunk_size, now)),
+    ]
+    touched = set()
+    for label, total, batches in steps:
+        if not total:
+            continue
+        started = time.perf_counter()
+        counts = write(batches())
+        touched.update(counts)
+        report(label, counts, started)
+
+    # Rows were written with Core, past the session hooks that version
+    # them; bump the table scopes once so cached ETags don't survive (new
+    # products also change the category tree's counts), and the per-buyer
+    # order scopes (see etags.SCOPE_RESOLVERS) of everyone who got new
+    # orders, a chunk of buyers at a time
+    if 'products' in touched:
+        touched |= product_scopes()
+    with db.engine.begin() as conn:
+        bump_versions(conn, touched)
+        if 'orders' in touched:
+            buyers = conn.execute(select(Order.user_id).where(Order.id >= first_order_id).distinct()).scalars()
+            while True:
+                chunk = list(islice(buyers, chunk_size))
+                if not chunk:
+                    break
+                bump_versions(conn, {f'orders:{user_id}' for user_id in chunk})
+        if db.engine.dialect.name == 'sqlite':
+            conn.execute(text('ANALYZE'))
@@ -0,0 +1,23 @@
+#gunicorn settings for serving app:app with several workers, e.g.
+#  PROMETHEUS_MULTIPROC_DIR=/tmp/metrics gunicorn app:app
+import os
+import shutil
+
+bind = os.environ.get('BIND', '0.0.0.0:5555')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+
+
+def on_starting(server):
+    # Samples left by a previous run would be added into the new totals
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    # Drops the exited worker's live gauges (in-flight requests, checked out
+    # connections, cache sizes); its counters keep counting toward totals
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,95 @@
+#password hashing on a bounded process pool, off the request threads
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from config import app
+
+
+class HashingBusy(Exception):
+    pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Hashes queued or running across the pool. Requests beyond this fail fast
+# instead of piling up behind a burst of logins.
+_slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_QUEUE_DEPTH'])
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver children don't inherit the server's threads or locks
+            _pool = ProcessPoolExecutor(
+                max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                mp_context=multiprocessing.get_context('forkserver'),
+            )
+        return _pool
+
+
+def discard_pool(pool):
+    # A pool stays broken once a child dies (OOM kill, crash); drop it so
+    # the next call starts a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_in_pool(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy('Too many password operations in progress, try again shortly')
+    pool = get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        discard_pool(pool)
+        raise HashingBusy('Password hashing is restarting, try again shortly')
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+    except TimeoutError:
+        raise HashingBusy('Password operation timed out, try again shortly')
+    except BrokenProcessPool:
+        discard_pool(pool)
+        raise HashingBusy('Password hashing is restarting, try again shortly')
+
+
+def hash_password(password):
+    return run_in_pool(generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(password_hash, password):
+    return run_in_pool(check_password_hash, password_hash, password)
+
+
+def method_parameters(method):
+    """Split a werkzeug method such as 'scrypt' or 'pbkdf2:sha256:600000'
+    into its name and parameters, filling in the defaults werkzeug uses."""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        defaults = [2 ** 15, 8, 1]
+    elif name == 'pbkdf2':
+        defaults = ['sha256', DEFAULT_PBKDF2_ITERATIONS]
+    else:
+        defaults = []
+    args = [int(arg) if arg.isdigit() else arg for arg in args]
+    return [name] + args + defaults[len(args):]
+
+
+def needs_rehash(password_hash):
+    # Werkzeug hashes look like "<method>$<salt>$<hash>", with every
+    # parameter spelled out in the method
+    method = password_hash.split('$', 1)[0]
+    return method_parameters(method) != method_parameters(app.config['PASSWORD_HASH_METHOD'])
@@ -0,0 +1,81 @@
+#per request SQL/serialization timings (Server-Timing) and the slow query log
+import json
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import app
+
+slow_query_log = logging.getLogger('slow_queries')
+slow_query_log.setLevel(logging.INFO)
+if app.config['SLOW_QUERY_LOG']:
+    handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'])
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_query_log.addHandler(handler)
+    slow_query_log.propagate = False
+
+
+def redacted(parameters):
+    # Values can be passwords, emails or addresses; only their types are logged
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redacted(value) if isinstance(value, (dict, list, tuple)) else type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_started
+    timing = g.get('timing') if has_request_context() else None
+    if timing is not None:
+        timing['queries'] += 1
+        timing['db'] += elapsed
+
+    if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+        slow_query_log.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': round(elapsed * 1000, 2),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'method': request.method if has_request_context() else None,
+            'path': request.path if has_request_context() else None,
+            'statement': ' '.join(statement.split()),
+            'parameters': redacted(parameters),
+            'executemany': executemany,
+        }))
+
+
+def add_serialize_time(seconds):
+    timing = g.get('timing') if has_request_context() else None
+    if timing is not None:
+        timing['serialize'] += seconds
+
+
+@app.before_request
+def start_request_timer():
+    g.timing = {'start': time.perf_counter(), 'queries': 0, 'db': 0.0, 'serialize': 0.0}
+
+
+@app.after_request
+def add_server_timing(response):
+    timing = g.pop('timing', None)
+    if timing is None or not app.config['SERVER_TIMING']:
+        return response
+    total = time.perf_counter() - timing['start']
+    # Handler time is what's left once SQL and JSON encoding are taken out
+    handler = max(total - timing['db'] - timing['serialize'], 0)
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;desc="{timing["queries"]} queries";dur={timing["db"] * 1000:.2f}',
+        f'serialize;dur={timing["serialize"] * 1000:.2f}',
+        f'handler;dur={handler * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+    return response
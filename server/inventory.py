@@ -0,0 +1,81 @@
+#order line items and guarded inventory updates
+from collections import Counter
+
+from sqlalchemy import update
+
+from config import db
+from etags import INVENTORY_COLUMNS, product_scopes
+from models import OrderItem, Product
+
+# Stock updates only bump the 'inventory' version scope (see etags.py)
+STOCK_OPTIONS = {'synchronize_session': False, 'version_scopes': product_scopes(INVENTORY_COLUMNS)}
+
+
+class OrderItemError(ValueError):
+    pass
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(f'Insufficient inventory for product {product_id}')
+        self.product_id = product_id
+
+
+def build_order_items(items):
+    """Validate request line items and snapshot each product's current price,
+    loading every price in one query."""
+    lines = []
+    for item in items:
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError):
+            raise OrderItemError('Each item needs a product_id and an integer quantity')
+        if quantity < 1:
+            raise OrderItemError('Item quantities must be positive')
+        lines.append((product_id, quantity, item.get('size'), item.get('color')))
+
+    product_ids = {product_id for product_id, _, _, _ in lines}
+    prices = dict(db.session.query(Product.id, Product.price).filter(Product.id.in_(product_ids))) if lines else {}
+    missing = sorted(product_ids - prices.keys())
+    if missing:
+        raise OrderItemError(f'Product {missing[0]} not found')
+
+    return [
+        OrderItem(product_id=product_id, quantity=quantity, unit_price=prices[product_id], size=size, color=color)
+        for product_id, quantity, size, color in lines
+    ]
+
+
+def quantities_by_product(order_items):
+    totals = Counter()
+    for item in order_items:
+        totals[item.product_id] += item.quantity
+    # Sorted so concurrent checkouts lock product rows in the same order
+    return sorted(totals.items())
+
+
+def reserve_inventory(order_items):
+    """Decrement stock for the items in the current transaction. The
+    inventory_count >= quantity guard makes the check and the decrement one
+    atomic statement, so concurrent checkouts can't oversell."""
+    for product_id, quantity in quantities_by_product(order_items):
+        result = db.session.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.inventory_count >= quantity)
+            .values(inventory_count=Product.inventory_count - quantity)
+            .execution_options(**STOCK_OPTIONS)
+        )
+        if result.rowcount != 1:
+            raise OutOfStock(product_id)
+
+
+def release_inventory(order_items):
+    """Return the items' quantities to stock, e.g. when an order's items change."""
+    for product_id, quantity in quantities_by_product(order_items):
+        db.session.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(inventory_count=Product.inventory_count + quantity)
+            .execution_options(**STOCK_OPTIONS)
+        )
@@ -0,0 +1,113 @@
+#Prometheus metrics at /metrics. With PROMETHEUS_MULTIPROC_DIR set, every
+#worker writes its samples to memory mapped files in that directory and a
+#scrape of any worker reports the sum (see gunicorn.conf.py).
+import os
+import threading
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+from config import app
+from auth import user_cache
+from cache import response_cache
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests handled', ['resource', 'method', 'status'])
+LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency', ['resource', 'method'])
+IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being handled', multiprocess_mode='livesum')
+
+DB_CONNECTIONS = Counter('db_pool_connections_total', 'New DB connections opened by the pool')
+DB_CHECKOUTS = Counter('db_pool_checkouts_total', 'Connections checked out of the pool')
+DB_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections currently checked out', multiprocess_mode='livesum')
+
+CACHE_HITS = Counter('cache_hits_total', 'Cache lookups served from the cache', ['cache'])
+CACHE_MISSES = Counter('cache_misses_total', 'Cache lookups that missed', ['cache'])
+CACHE_EVICTIONS = Counter('cache_evictions_total', 'Entries evicted to stay under the size cap', ['cache'])
+CACHE_ENTRIES = Gauge('cache_entries', 'Entries held by the cache', ['cache'], multiprocess_mode='livesum')
+
+CACHES = {'response': response_cache, 'user': user_cache}
+
+
+def resource_name():
+    # The Resource class for Flask-RESTful views, so labels stay a small fixed set
+    view = app.view_functions.get(request.endpoint)
+    if view is None:
+        return 'unmatched'
+    view_class = getattr(view, 'view_class', None)
+    return view_class.__name__ if view_class else request.endpoint
+
+
+@app.before_request
+def start_metrics():
+    g.metrics_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_metrics(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        resource = resource_name()
+        LATENCY.labels(resource, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(resource, request.method, str(response.status_code)).inc()
+    sync_cache_metrics()
+    return response
+
+
+@app.teardown_request
+def finish_metrics(exc):
+    if g.pop('metrics_started', None) is not None:
+        IN_FLIGHT.dec()
+
+
+# The caches count hits under their own lock; their counters are copied
+# into Prometheus as deltas after each request rather than adding work to
+# every lookup
+_synced = {name: {'hits': 0, 'misses': 0, 'evictions': 0} for name in CACHES}
+_sync_lock = threading.Lock()
+
+
+def sync_cache_metrics():
+    if not _sync_lock.acquire(blocking=False):
+        return  # another request thread is already syncing
+    try:
+        for name, cache in CACHES.items():
+            stats = cache.stats()
+            last = _synced[name]
+            for key, metric in (('hits', CACHE_HITS), ('misses', CACHE_MISSES), ('evictions', CACHE_EVICTIONS)):
+                if stats[key] > last[key]:
+                    metric.labels(name).inc(stats[key] - last[key])
+                    last[key] = stats[key]
+            CACHE_ENTRIES.labels(name).set(stats['size'])
+    finally:
+        _sync_lock.release()
+
+
+@event.listens_for(Pool, 'connect')
+def count_connection(dbapi_connection, connection_record):
+    DB_CONNECTIONS.inc()
+
+
+@event.listens_for(Pool, 'checkout')
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_CHECKOUTS.inc()
+    DB_CHECKED_OUT.inc()
+
+
+@event.listens_for(Pool, 'checkin')
+def count_checkin(dbapi_connection, connection_record):
+    DB_CHECKED_OUT.dec()
+
+
+@app.route('/metrics')
+def metrics():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,140 @@
+"""Add order_items and backfill from items_json
+
+Revision ID: 0c5e2b7d9a41
+Revises: f7fd323053d0
+Create Date: 2026-10-18 08:55:42.847768
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+
+# revision identifiers, used by Alembic.
+revision = '0c5e2b7d9a41'
+down_revision = 'f7fd323053d0'
+branch_labels = None
+depends_on = None
+
+
+# Orders converted per round trip, so the backfill never holds the whole
+# orders table in memory
+BATCH_SIZE = 1000
+
+orders = sa.table('orders',
+    sa.column('id', sa.Integer),
+    sa.column('items_json', sa.Text),
+)
+products = sa.table('products',
+    sa.column('id', sa.Integer),
+    sa.column('price', sa.Float),
+)
+order_items = sa.table('order_items',
+    sa.column('order_id', sa.Integer),
+    sa.column('product_id', sa.Integer),
+    sa.column('quantity', sa.Integer),
+    sa.column('unit_price', sa.Float),
+    sa.column('size', sa.String),
+    sa.column('color', sa.String),
+)
+
+
+def parse_items(items_json):
+    try:
+        items = json.loads(items_json)
+    except ValueError:
+        return []
+    return [item for item in items if isinstance(item, dict) and item.get('product_id') is not None]
+
+
+def backfill_order_items(conn):
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(orders.c.id, orders.c.items_json)
+            .where(orders.c.id > last_id, orders.c.items_json.isnot(None))
+            .order_by(orders.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        parsed = [(order_id, parse_items(items_json)) for order_id, items_json in rows]
+        product_ids = {item['product_id'] for _, items in parsed for item in items}
+        prices = dict(conn.execute(
+            sa.select(products.c.id, products.c.price).where(products.c.id.in_(product_ids))
+        ).fetchall()) if product_ids else {}
+
+        # Lines for products that no longer exist can't satisfy the foreign key
+        batch = [
+            {
+                'order_id': order_id,
+                'product_id': item['product_id'],
+                'quantity': item.get('quantity', 1),
+                'unit_price': item.get('price', prices[item['product_id']]),
+                'size': item.get('size'),
+                'color': item.get('color'),
+            }
+            for order_id, items in parsed
+            for item in items
+            if item['product_id'] in prices
+        ]
+        if batch:
+            conn.execute(order_items.insert(), batch)
+
+
+def upgrade():
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('size', sa.String(length=20), nullable=True),
+    sa.Column('color', sa.String(length=30), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], name=op.f('fk_order_items_order_id_orders')),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], name=op.f('fk_order_items_product_id_products')),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'])
+    op.create_index('ix_order_items_product_id', 'order_items', ['product_id'])
+
+    backfill_order_items(op.get_bind())
+
+
+def downgrade():
+    # Orders placed after the upgrade only have order_items rows; write them
+    # back to items_json before dropping the table
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        ids = conn.execute(
+            sa.select(orders.c.id)
+            .where(orders.c.id > last_id, orders.c.items_json.is_(None))
+            .order_by(orders.c.id)
+            .limit(BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        lines = {}
+        for row in conn.execute(
+            sa.select(order_items).where(order_items.c.order_id.in_(ids))
+        ).mappings():
+            lines.setdefault(row['order_id'], []).append({
+                'product_id': row['product_id'],
+                'quantity': row['quantity'],
+                'price': row['unit_price'],
+                'size': row['size'],
+                'color': row['color'],
+            })
+        for order_id, items in lines.items():
+            conn.execute(
+                orders.update().where(orders.c.id == order_id).values(items_json=json.dumps(items))
+            )
+
+    op.drop_index('ix_order_items_product_id', table_name='order_items')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_table('order_items')
@@ -0,0 +1,26 @@
+"""Index products.price
+
+Revision ID: 4a818d765e5f
+Revises: b8b3603c2e8b
+Create Date: 2026-10-18 09:08:31.336691
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a818d765e5f'
+down_revision = 'b8b3603c2e8b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves ?min_price=/?max_price= and ?sort=price; SQLite appends the rowid
+    # to every index entry, so (price, id) keyset pages read it in order
+    op.create_index('ix_products_price', 'products', ['price'])
+
+
+def downgrade():
+    op.drop_index('ix_products_price', table_name='products')
@@ -0,0 +1,38 @@
+"""Add users.is_admin and products.created_at
+
+Revision ID: 6eb5866e0be8
+Revises: 0c5e2b7d9a41
+Create Date: 2026-10-18 08:57:57.119024
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6eb5866e0be8'
+down_revision = '0c5e2b7d9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD/DROP COLUMN rather than batch mode: rebuilding products would
+    # drop the products_fts triggers. SQLite can't add a CURRENT_TIMESTAMP
+    # default, so new rows get created_at from the model and existing rows
+    # are stamped here. Nobody is made an admin: grant it with flask set-admin
+    op.add_column('users', sa.Column('is_admin', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('products', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE products SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+
+    op.create_index('ix_users_created_at', 'users', ['created_at'])
+    op.create_index('ix_products_created_at', 'products', ['created_at'])
+    op.create_index('ix_orders_created_at', 'orders', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_orders_created_at', table_name='orders')
+    op.drop_index('ix_products_created_at', table_name='products')
+    op.drop_index('ix_users_created_at', table_name='users')
+    op.drop_column('products', 'created_at')
+    op.drop_column('users', 'is_admin')
@@ -0,0 +1,43 @@
+"""Add indexes for foreign keys and filter columns
+
+Revision ID: b57c3850512a
+Revises: 403a037899eb
+Create Date: 2026-10-18 08:52:26.714451
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b57c3850512a'
+down_revision = '403a037899eb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate product/category links before enforcing uniqueness,
+    # keeping the oldest row of each pair
+    op.execute(
+        'DELETE FROM product_categories WHERE id NOT IN '
+        '(SELECT MIN(id) FROM product_categories GROUP BY product_id, category_id)'
+    )
+
+    op.create_index('ix_products_subcategory_id', 'products', ['subcategory_id'])
+    op.create_index('ix_products_user_id', 'products', ['user_id'])
+    op.create_index('ix_product_categories_category_id_product_id', 'product_categories', ['category_id', 'product_id'])
+    op.create_index('uq_product_categories_product_id_category_id', 'product_categories', ['product_id', 'category_id'], unique=True)
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'])
+    op.create_index('ix_subcategories_name', 'subcategories', ['name'])
+    op.create_index('ix_subcategories_category_id', 'subcategories', ['category_id'])
+
+
+def downgrade():
+    op.drop_index('ix_subcategories_category_id', table_name='subcategories')
+    op.drop_index('ix_subcategories_name', table_name='subcategories')
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
+    op.drop_index('uq_product_categories_product_id_category_id', table_name='product_categories')
+    op.drop_index('ix_product_categories_category_id_product_id', table_name='product_categories')
+    op.drop_index('ix_products_user_id', table_name='products')
+    op.drop_index('ix_products_subcategory_id', table_name='products')
@@ -0,0 +1,86 @@
+"""Add product_attributes for size and color facets
+
+Revision ID: b8b3603c2e8b
+Revises: 6eb5866e0be8
+Create Date: 2026-10-18 09:07:05.996839
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8b3603c2e8b'
+down_revision = '6eb5866e0be8'
+branch_labels = None
+depends_on = None
+
+
+# Products converted per round trip
+BATCH_SIZE = 1000
+
+products = sa.table('products',
+    sa.column('id', sa.Integer),
+    sa.column('available_sizes', sa.String),
+    sa.column('available_colors', sa.String),
+)
+product_attributes = sa.table('product_attributes',
+    sa.column('product_id', sa.Integer),
+    sa.column('kind', sa.String),
+    sa.column('value', sa.String),
+)
+
+
+def parse_values(raw):
+    try:
+        values = json.loads(raw) if raw else []
+    except ValueError:
+        return []
+    return list(dict.fromkeys(str(value) for value in values)) if isinstance(values, list) else []
+
+
+def backfill_product_attributes(conn):
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(products.c.id, products.c.available_sizes, products.c.available_colors)
+            .where(products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        batch = [
+            {'product_id': product_id, 'kind': kind, 'value': value}
+            for product_id, sizes, colors in rows
+            for kind, raw in (('size', sizes), ('color', colors))
+            for value in parse_values(raw)
+        ]
+        if batch:
+            conn.execute(product_attributes.insert(), batch)
+
+
+def upgrade():
+    op.create_table('product_attributes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('value', sa.String(length=50), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], name=op.f('fk_product_attributes_product_id_products')),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_product_attributes_kind_value_product_id', 'product_attributes', ['kind', 'value', 'product_id'])
+    op.create_index('uq_product_attributes_product_id_kind_value', 'product_attributes', ['product_id', 'kind', 'value'], unique=True)
+
+    backfill_product_attributes(op.get_bind())
+
+
+def downgrade():
+    # available_sizes/available_colors were kept up to date alongside the
+    # rows, so nothing needs writing back
+    op.drop_index('uq_product_attributes_product_id_kind_value', table_name='product_attributes')
+    op.drop_index('ix_product_attributes_kind_value_product_id', table_name='product_attributes')
+    op.drop_table('product_attributes')
@@ -0,0 +1,28 @@
+"""Add table_versions for conditional GET
+
+Revision ID: f7fd323053d0
+Revises: b57c3850512a
+Create Date: 2026-10-18 08:54:32.150762
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7fd323053d0'
+down_revision = 'b57c3850512a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_versions',
+    sa.Column('scope', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade():
+    op.drop_table('table_versions')
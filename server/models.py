@@ -2,11 +2,23 @@
 from sqlalchemy.ext.hybrid import hybrid_property
 #turn db objects into dicts/json
 from sqlalchemy_serializer import SerializerMixin
+#loader options for listing queries
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.dialects import sqlite
 import json
 
 #Grabs db from config
 from config import db
 
+# SQLite fills CURRENT_TIMESTAMP defaults in as 'YYYY-MM-DD HH:MM:SS'. Binding
+# datetimes in that same format keeps comparisons against stored values exact
+# (keyset cursors on created_at, ?since=); the default format adds
+# microseconds, so equal timestamps would compare as unequal text.
+Timestamp = db.DateTime().with_variant(
+    sqlite.DATETIME(storage_format='%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d'),
+    'sqlite',
+)
+
 class User(db.Model, SerializerMixin):
     __tablename__ = 'users'
 
@@ -15,7 +27,8 @@ class User(db.Model, SerializerMixin):
     email = db.Column(db.String(50), nullable=False, unique=True)
     _password_hash = db.Column(db.String(128), nullable=False)
     address = db.Column(db.String(200))
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    is_admin = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    created_at = db.Column(Timestamp, server_default=db.func.now(), index=True)
 
     # Relationships
     products = db.relationship('Product', back_populates='seller', cascade='all, delete-orphan')
@@ -30,12 +43,16 @@ class User(db.Model, SerializerMixin):
 
     @password_hash.setter
     def password_hash(self, password):
-        from werkzeug.security import generate_password_hash
-        self._password_hash = generate_password_hash(password)
+        from hashing import hash_password
+        self._password_hash = hash_password(password)
 
     def check_password(self, password):
-        from werkzeug.security import check_password_hash
-        return check_password_hash(self._password_hash, password)
+        from hashing import verify_password
+        return verify_password(self._password_hash, password)
+
+    def password_needs_rehash(self):
+        from hashing import needs_rehash
+        return needs_rehash(self._password_hash)
 
     def to_dict(self):
         return {
@@ -52,31 +69,47 @@ class Product(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
     inventory_count = db.Column(db.Integer, default=0)
     image_url = db.Column(db.String(255))
     available_sizes = db.Column(db.String(255))
     available_colors = db.Column(db.String(255))
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    subcategory_id = db.Column(db.Integer, db.ForeignKey('subcategories.id'))  # New field
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    subcategory_id = db.Column(db.Integer, db.ForeignKey('subcategories.id'), index=True)  # New field
+    # Client side default: the column was added to an existing SQLite table,
+    # which can't carry a CURRENT_TIMESTAMP server default
+    created_at = db.Column(Timestamp, default=db.func.now(), index=True)
 
     # Relationships
     seller = db.relationship('User', back_populates='products')
     product_categories = db.relationship('ProductCategory', back_populates='product', cascade='all, delete-orphan')
     subcategory = db.relationship('Subcategory', back_populates='products')
+    attributes = db.relationship('ProductAttribute', back_populates='product', cascade='all, delete-orphan')
 
     # Serialization rules
-    serialize_rules = ('-seller.products', '-product_categories.product', '-subcategory.products')
+    serialize_rules = ('-seller.products', '-product_categories.product', '-subcategory.products', '-attributes')
+
+    # Helper methods for JSON attributes. The setters also keep the indexed
+    # product_attributes rows in step with the JSON columns.
+    def set_attributes(self, kind, values):
+        # Unchanged values keep their rows; replacing them would insert a
+        # duplicate before the old row is deleted
+        existing = {attribute.value: attribute for attribute in self.attributes if attribute.kind == kind}
+        self.attributes = [attribute for attribute in self.attributes if attribute.kind != kind] + [
+            existing.get(value) or ProductAttribute(kind=kind, value=value)
+            for value in dict.fromkeys(str(value) for value in values)
+        ]
 
-    # Helper methods for JSON attributes
     def set_sizes(self, sizes_list):
         self.available_sizes = json.dumps(sizes_list)
+        self.set_attributes('size', sizes_list)
 
     def get_sizes(self):
         return json.loads(self.available_sizes) if self.available_sizes else []
 
     def set_colors(self, colors_list):
         self.available_colors = json.dumps(colors_list)
+        self.set_attributes('color', colors_list)
 
     def get_colors(self):
         return json.loads(self.available_colors) if self.available_colors else []
@@ -95,8 +128,19 @@ class Product(db.Model, SerializerMixin):
             'subcategory_id': self.subcategory_id,
             'category': [pc.category.name for pc in self.product_categories],  # Add category names
             'subcategory': self.subcategory.name if self.subcategory else None,  # Add subcategory name
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Loader options for queries that serialize products with to_dict.
+# Categories are fetched with one extra SELECT ... IN per page of products
+# and subcategories are joined in, so a listing costs a fixed number of
+# statements instead of one per product relation.
+def product_listing_options():
+    return (
+        selectinload(Product.product_categories).joinedload(ProductCategory.category),
+        joinedload(Product.subcategory),
+    )
+
 class Category(db.Model, SerializerMixin):
     __tablename__ = 'categories'
 
@@ -123,8 +167,8 @@ class Subcategory(db.Model, SerializerMixin):
     __tablename__ = 'subcategories'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    name = db.Column(db.String(50), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False, index=True)
 
     # Relationships
     category = db.relationship('Category', back_populates='subcategories')
@@ -142,6 +186,10 @@ class Subcategory(db.Model, SerializerMixin):
 
 class ProductCategory(db.Model, SerializerMixin):
     __tablename__ = 'product_categories'
+    __table_args__ = (
+        db.Index('ix_product_categories_category_id_product_id', 'category_id', 'product_id'),
+        db.Index('uq_product_categories_product_id_category_id', 'product_id', 'category_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     featured = db.Column(db.Boolean, default=False)
@@ -165,29 +213,53 @@ class ProductCategory(db.Model, SerializerMixin):
             'featured': self.featured
         }
 
+class ProductAttribute(db.Model):
+    __tablename__ = 'product_attributes'
+    __table_args__ = (
+        db.Index('ix_product_attributes_kind_value_product_id', 'kind', 'value', 'product_id'),
+        db.Index('uq_product_attributes_product_id_kind_value', 'product_id', 'kind', 'value', unique=True),
+    )
+
+    # One row per size or color a product comes in, mirroring
+    # available_sizes/available_colors so facets and filters can use an index
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # 'size' or 'color'
+    value = db.Column(db.String(50), nullable=False)
+
+    # Relationships
+    product = db.relationship('Product', back_populates='attributes')
+
+def attribute_rows(product_id, sizes, colors):
+    """product_attributes rows for a product inserted without the ORM."""
+    return [
+        {'product_id': product_id, 'kind': kind, 'value': value}
+        for kind, values in (('size', sizes), ('color', colors))
+        for value in dict.fromkeys(str(value) for value in values)
+    ]
+
 class Order(db.Model, SerializerMixin):
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     status = db.Column(db.String(20), default='pending')
     total_amount = db.Column(db.Float, nullable=False)
     shipping_address = db.Column(db.String(255))
+    # Legacy JSON line items, superseded by order_items (backfilled by
+    # migration 0c5e2b7d9a41) and no longer written
     items_json = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    created_at = db.Column(Timestamp, server_default=db.func.now(), index=True)
     
     # Relationships
     buyer = db.relationship('User', back_populates='orders')
+    items = db.relationship('OrderItem', back_populates='order', cascade='all, delete-orphan')
     
     # Serialization rules
-    serialize_rules = ('-buyer.orders',)
-    
-    # Helper methods for JSON attributes
-    def set_items(self, items_list):
-        self.items_json = json.dumps(items_list)
-        
-    def get_items(self):
-        return json.loads(self.items_json) if self.items_json else []
+    serialize_rules = ('-buyer.orders', '-items.order')
 
     def to_dict(self):
         return {
@@ -196,6 +268,41 @@ class Order(db.Model, SerializerMixin):
             'status': self.status,
             'total_amount': self.total_amount,
             'shipping_address': self.shipping_address,
-            'items': self.get_items(),
+            'items': [item.to_dict() for item in self.items],
             'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+class OrderItem(db.Model, SerializerMixin):
+    __tablename__ = 'order_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)  # Price snapshot at checkout
+    size = db.Column(db.String(20))
+    color = db.Column(db.String(30))
+
+    # Relationships
+    order = db.relationship('Order', back_populates='items')
+    product = db.relationship('Product')
+
+    # Serialization rules
+    serialize_rules = ('-order.items', '-product')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'quantity': self.quantity,
+            'unit_price': self.unit_price,
+            'size': self.size,
+            'color': self.color
+        }
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    # A table name, or a narrower scope such as orders:<user_id>
+    scope = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,50 @@
+#GET /products?ids=1,2,3: several products in one request and one query
+from config import app
+from cache import MISSING, cache_key, response_cache
+from etags import PRODUCT_SCOPES
+from models import Product
+from serializers import RawJSON, dumps, select_products, serialize_products
+
+
+class IdsError(ValueError):
+    pass
+
+
+def parse_ids(raw):
+    try:
+        ids = [int(part) for part in raw.split(',') if part.strip()]
+    except ValueError:
+        raise IdsError('ids must be a comma separated list of integers')
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise IdsError('ids must list at least one id')
+    if len(ids) > app.config['MULTI_GET_MAX_IDS']:
+        raise IdsError(f"At most {app.config['MULTI_GET_MAX_IDS']} ids per request")
+    return ids
+
+
+def products_by_id(ids, fields, fields_arg=None):
+    """Return the products keyed by id plus the ids that don't exist.
+    Each product shares its response_cache entry with /products/<id> (for
+    the same ?fields=), and the uncached ones are read in a single query."""
+    args = [('fields', fields_arg)] if fields_arg is not None else []
+    keys = {id: cache_key(f'/products/{id}', args, PRODUCT_SCOPES) for id in ids}
+
+    bodies = {}
+    for id, key in keys.items():
+        cached = response_cache.get(key)
+        if cached is not MISSING:
+            bodies[id] = cached[0]
+
+    uncached = [id for id in ids if id not in bodies]
+    if uncached:
+        rows = select_products(Product.query.filter(Product.id.in_(uncached)), fields).all()
+        for product in serialize_products(rows, fields):
+            body = dumps(product)
+            response_cache.set(keys[product['id']], (body, 200, 'application/json'))
+            bodies[product['id']] = body
+
+    return {
+        'products': {id: RawJSON(bodies[id]) for id in ids if id in bodies},
+        'missing': [id for id in ids if id not in bodies],
+    }
@@ -0,0 +1,102 @@
+#keyset (cursor) pagination for collection endpoints
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def wants_page():
+    # Pagination is opt-in so existing clients keep getting plain lists
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def cursor_value(column, value):
+    # Decoded values are bound as SQL parameters, so each must be a scalar
+    # of its sort key's type (datetimes travel as ISO strings)
+    python_type = column.type.python_type
+    if value is None and getattr(column, 'nullable', False) and not getattr(column, 'primary_key', False):
+        return None
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if python_type is float and type(value) in (int, float):
+        return value
+    if python_type in (int, str) and type(value) is python_type:
+        return value
+    raise PaginationError('Invalid cursor')
+
+
+def decode_cursor(token, keys):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise PaginationError('Invalid cursor')
+    try:
+        return [cursor_value(column, value) for (column, _), value in zip(keys, values)]
+    except ValueError:
+        raise PaginationError('Invalid cursor')
+
+
+def page_limit():
+    default = current_app.config.get('PAGE_SIZE_DEFAULT', 50)
+    maximum = current_app.config.get('PAGE_SIZE_MAX', 500)
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, maximum)
+
+
+def after_cursor(keys, values):
+    # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y) so it works
+    # with mixed sort directions and on any backend
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        bound = column < values[i] if descending else column > values[i]
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, bound))
+    if len(keys) == 1:
+        return clauses[0]
+    # The OR alone isn't a range the planner can seek to; the redundant
+    # a >= x lets it start the index walk at the cursor instead of the top
+    column, descending = keys[0]
+    return and_(column <= values[0] if descending else column >= values[0], or_(*clauses))
+
+
+def order_by_keys(keys):
+    return [column.desc() if descending else column.asc() for column, descending in keys]
+
+
+def keyset_page(query, keys, serialize, many=False):
+    """Return one page of query ordered by keys, a list of (column, descending)
+    pairs whose last entry is unique (normally the primary key). serialize
+    takes one row, or the whole page when many is True."""
+    limit = page_limit()
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(after_cursor(keys, decode_cursor(cursor, keys)))
+    query = query.order_by(*order_by_keys(keys))
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column, _ in keys])
+    items = serialize(rows) if many else [serialize(row) for row in rows]
+    return {'items': items, 'next_cursor': next_cursor}
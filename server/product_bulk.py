@@ -0,0 +1,238 @@
+#bulk PATCH /products/bulk: many product updates applied in one transaction
+import json
+import math
+
+from sqlalchemy import delete, insert, select, update
+
+from config import app, db
+from etags import product_scopes
+from models import Category, Product, ProductAttribute, ProductCategory, Subcategory
+
+# Fields written straight to the products row
+COLUMN_FIELDS = ('name', 'description', 'price', 'inventory_count', 'image_url', 'subcategory_id')
+
+# List fields stored as JSON text on the product and as product_attributes rows
+ATTRIBUTE_FIELDS = {'sizes': ('available_sizes', 'size'), 'colors': ('available_colors', 'color')}
+
+UPDATE_FIELDS = COLUMN_FIELDS + tuple(ATTRIBUTE_FIELDS) + ('categories', 'featured')
+
+# Fields holding text; all but name may be set to null
+TEXT_FIELDS = ('name', 'description', 'image_url')
+
+
+class BulkUpdateError(ValueError):
+    pass
+
+
+def parse_updates(data, max_items):
+    """Check the body is a list of {"id": ..., "fields": {...}} objects."""
+    if not isinstance(data, list):
+        raise BulkUpdateError('Body must be a JSON list of {"id", "fields"} objects')
+    if not data:
+        raise BulkUpdateError('Body must contain at least one update')
+    if len(data) > max_items:
+        raise BulkUpdateError(f'At most {max_items} updates per request')
+    return data
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def clean_fields(fields):
+    """Validate one item's fields, converting numbers the way the import does."""
+    if not isinstance(fields, dict) or not fields:
+        raise ValueError('fields must be a non-empty object')
+    unknown = set(fields) - set(UPDATE_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown field(s): {", ".join(sorted(unknown))}')
+    fields = dict(fields)
+    for key in TEXT_FIELDS:
+        if not isinstance(fields.get(key, ''), (str, type(None))):
+            raise ValueError(f'{key} must be a string')
+    if 'name' in fields and not fields['name']:
+        raise ValueError('name cannot be empty')
+    try:
+        if 'price' in fields:
+            fields['price'] = float(fields['price'])
+        if 'inventory_count' in fields:
+            fields['inventory_count'] = int(fields['inventory_count'] or 0)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('price and inventory_count must be numbers')
+    if not math.isfinite(fields.get('price', 0)):
+        raise ValueError('price must be a finite number')
+    if fields.get('subcategory_id') is not None and not is_int(fields['subcategory_id']):
+        raise ValueError('subcategory_id must be an integer')
+    for key in ('sizes', 'colors', 'categories'):
+        if not isinstance(fields.get(key, []), list):
+            raise ValueError(f'{key} must be a list')
+    if not all(is_int(category_id) for category_id in fields.get('categories', [])):
+        raise ValueError('categories must be a list of category ids')
+    if not isinstance(fields.get('featured', False), bool):
+        raise ValueError('featured must be true or false')
+    return fields
+
+
+def existing_ids(model, ids):
+    if not ids:
+        return set()
+    return set(db.session.scalars(select(model.id).where(model.id.in_(ids))))
+
+
+def check_references(fields, categories, subcategories):
+    subcategory_id = fields.get('subcategory_id')
+    if subcategory_id is not None and subcategory_id not in subcategories:
+        raise ValueError(f'Unknown subcategory {subcategory_id}')
+    for category_id in fields.get('categories', []):
+        if category_id not in categories:
+            raise ValueError(f'Unknown category {category_id}')
+
+
+def update_columns(patches):
+    rows = []
+    for id, fields in patches.items():
+        row = {field: fields[field] for field in COLUMN_FIELDS if field in fields}
+        for field, (column, _) in ATTRIBUTE_FIELDS.items():
+            if field in fields:
+                row[column] = json.dumps(fields[field])
+        if row:
+            rows.append({'id': id, **row})
+    if rows:
+        # ORM bulk UPDATE by primary key: one executemany per set of keys.
+        # Repricing alone leaves the category tree's scopes alone.
+        changed = {key for row in rows for key in row} - {'id'}
+        db.session.execute(update(Product), rows, execution_options={'version_scopes': product_scopes(changed)})
+
+
+def sync_attributes(patches):
+    """Bring product_attributes in line with the new sizes/colors, deleting
+    and inserting only the values that changed."""
+    wanted = {}
+    for id, fields in patches.items():
+        for field, (_, kind) in ATTRIBUTE_FIELDS.items():
+            if field in fields:
+                wanted[id, kind] = dict.fromkeys(str(value) for value in fields[field])
+    if not wanted:
+        return
+
+    stale = []
+    for row in db.session.execute(
+        select(ProductAttribute.id, ProductAttribute.product_id, ProductAttribute.kind, ProductAttribute.value)
+        .where(ProductAttribute.product_id.in_({id for id, _ in wanted}))
+    ):
+        values = wanted.get((row.product_id, row.kind))
+        if values is None:
+            continue
+        if row.value in values:
+            del values[row.value]  # already stored
+        else:
+            stale.append(row.id)
+
+    if stale:
+        db.session.execute(delete(ProductAttribute).where(ProductAttribute.id.in_(stale)))
+    rows = [
+        {'product_id': id, 'kind': kind, 'value': value}
+        for (id, kind), values in wanted.items()
+        for value in values
+    ]
+    if rows:
+        db.session.execute(insert(ProductAttribute), rows)
+
+
+def sync_categories(patches):
+    """Diff each product's category links against the requested ones: links
+    that stay keep their row (and featured flag, unless featured is given),
+    only removed and added categories are written. featured without
+    categories sets the flag on the product's current links."""
+    targets = {id: fields for id, fields in patches.items() if 'categories' in fields or 'featured' in fields}
+    if not targets:
+        return
+
+    kept = {id: set() for id in targets}
+    stale, featured = [], []
+    for row in db.session.execute(
+        select(ProductCategory.id, ProductCategory.product_id, ProductCategory.category_id, ProductCategory.featured)
+        .where(ProductCategory.product_id.in_(targets))
+    ):
+        fields = targets[row.product_id]
+        if 'categories' in fields and row.category_id not in fields['categories']:
+            stale.append(row.id)
+            continue
+        kept[row.product_id].add(row.category_id)
+        if 'featured' in fields and row.featured != fields['featured']:
+            featured.append({'id': row.id, 'featured': fields['featured']})
+
+    if stale:
+        db.session.execute(delete(ProductCategory).where(ProductCategory.id.in_(stale)))
+    if featured:
+        db.session.execute(update(ProductCategory), featured)
+    rows = [
+        {'product_id': id, 'category_id': category_id, 'featured': fields.get('featured', False)}
+        for id, fields in targets.items()
+        for category_id in dict.fromkeys(fields.get('categories', []))
+        if category_id not in kept[id]
+    ]
+    if rows:
+        db.session.execute(insert(ProductCategory), rows)
+
+
+def update_products(items, user_id):
+    """Apply a list of {"id", "fields"} updates to products owned by user_id
+    and return a report of the updated count and one result per item, in
+    request order. Items that fail validation, don't exist or belong to
+    someone else are reported and skipped; the rest are written together in
+    one transaction."""
+    results = [None] * len(items)
+    patches, positions = {}, {}
+    for index, item in enumerate(items):
+        id = item.get('id') if isinstance(item, dict) else None
+        try:
+            if not is_int(id):
+                raise ValueError('Each update needs an integer id')
+            if id in positions:
+                raise ValueError(f'Product {id} appears more than once')
+            positions[id] = index
+            patches[id] = clean_fields(item.get('fields'))
+        except ValueError as e:
+            results[index] = {'id': id, 'status': 400, 'error': str(e)}
+
+    # Ownership and referenced ids are each checked with one query per batch
+    owners = dict(db.session.execute(select(Product.id, Product.user_id).where(Product.id.in_(patches))).all())
+    categories = existing_ids(Category, {id for fields in patches.values() for id in fields.get('categories', [])})
+    subcategories = existing_ids(Subcategory, {fields.get('subcategory_id') for fields in patches.values()} - {None})
+
+    for id, fields in list(patches.items()):
+        if id not in owners:
+            status, error = 404, 'Product not found'
+        elif owners[id] != user_id:
+            status, error = 403, 'You do not have permission to edit this product'
+        else:
+            try:
+                check_references(fields, categories, subcategories)
+            except ValueError as e:
+                status, error = 400, str(e)
+            else:
+                continue
+        results[positions[id]] = {'id': id, 'status': status, 'error': error}
+        del patches[id]
+
+    if patches:
+        try:
+            update_columns(patches)
+            sync_attributes(patches)
+            sync_categories(patches)
+            db.session.commit()
+            status, error = 200, None
+        except Exception:
+            db.session.rollback()
+            # The database error carries SQL and bound values; log it, not return it
+            app.logger.exception('Bulk product update failed')
+            status, error = 500, 'The updates could not be saved; nothing was changed'
+        for id in patches:
+            result = {'id': id, 'status': status}
+            if error:
+                result['error'] = error
+            results[positions[id]] = result
+
+    updated = sum(result['status'] == 200 for result in results)
+    return {'updated': updated, 'failed': len(results) - updated, 'results': results}
@@ -0,0 +1,94 @@
+#filters and sort orders for the product listing (GET /products, /products/facets)
+from flask import request
+from sqlalchemy import and_
+
+from config import db
+from models import Category, Product, ProductAttribute, ProductCategory, Subcategory
+from search import ranks_search, search_products, search_rank
+
+
+class FilterError(ValueError):
+    pass
+
+
+# ?sort= value -> (column, descending) keys. id breaks ties so the order is
+# total and keyset cursors can resume from any row.
+SORTS = {
+    'price': [(Product.price, False), (Product.id, False)],
+    '-price': [(Product.price, True), (Product.id, True)],
+    'newest': [(Product.created_at, True), (Product.id, True)],
+}
+DEFAULT_SORT = [(Product.id, False)]
+
+
+def sort_keys():
+    sort = request.args.get('sort')
+    if not sort:
+        # Search results are paged in relevance order, id breaking ties
+        if ranks_search(request.args.get('search', '')):
+            return [(search_rank(), False), (Product.id, False)]
+        return DEFAULT_SORT
+    if sort not in SORTS:
+        raise FilterError(f'sort must be one of: {", ".join(SORTS)}')
+    return SORTS[sort]
+
+
+def price_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise FilterError(f'{name} must be a number')
+
+
+def with_attribute(kind, values):
+    # Several values for one attribute match any of them (?size=M,L).
+    # A correlated EXISTS probes the (product_id, kind, value) index per
+    # candidate row, so a page stops reading once it has enough matches; an
+    # IN list would first collect every product with that size or color.
+    return Product.attributes.any(and_(ProductAttribute.kind == kind, ProductAttribute.value.in_(values)))
+
+
+def filter_products(query, ranked=False):
+    """Apply the category, subcategory, size, color, price and search filters
+    in the request args. Search matches come best first when ranked is True."""
+    category_name = request.args.get('category')
+    subcategory_name = request.args.get('subcategory')
+    search_term = request.args.get('search')
+    min_price = price_arg('min_price')
+    max_price = price_arg('max_price')
+    
+    # Filter by category if specified. Names are resolved inside the
+    # statement and the IN subquery lets SQLite drive the lookup from
+    # the product_categories index instead of scanning products
+    if category_name and category_name != 'All':
+        in_category = (
+            db.select(ProductCategory.product_id)
+            .join(Category, Category.id == ProductCategory.category_id)
+            .where(Category.name == category_name)
+        )
+        query = query.filter(Product.id.in_(in_category))
+    
+    # Filter by subcategory if specified
+    if subcategory_name:
+        named_subcategories = db.select(Subcategory.id).where(Subcategory.name == subcategory_name)
+        query = query.filter(Product.subcategory_id.in_(named_subcategories))
+
+    # Sizes and colors are matched against product_attributes
+    for kind in ('size', 'color'):
+        values = [value.strip() for value in request.args.get(kind, '').split(',') if value.strip()]
+        if values:
+            query = query.filter(with_attribute(kind, values))
+
+    # Price bounds are inclusive and use ix_products_price
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    
+    # Filter by search term if specified
+    if search_term:
+        query = search_products(query, search_term, ranked=ranked)
+    return query
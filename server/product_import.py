@@ -0,0 +1,224 @@
+#streaming bulk product import (NDJSON or CSV request bodies)
+import csv
+import io
+import json
+from itertools import islice
+
+from sqlalchemy import insert, or_
+
+from config import db
+from models import Category, Product, ProductAttribute, ProductCategory, Subcategory, attribute_rows
+
+# Columns copied straight from an import row onto the product
+PRODUCT_FIELDS = ('name', 'description', 'price', 'inventory_count', 'image_url')
+
+# CSV cells holding several values separate them with this character
+CSV_LIST_SEPARATOR = '|'
+
+# Accepted spellings of the featured flag in CSV cells and loose JSON
+FLAG_VALUES = {'true': True, '1': True, 'yes': True, 'false': False, '0': False, 'no': False}
+
+
+def ndjson_rows(stream):
+    """Yield (line number, row dict or error message) for an NDJSON body."""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, 'Invalid JSON'
+            continue
+        yield line_number, row if isinstance(row, dict) else 'Each line must be a JSON object'
+
+
+def csv_rows(stream):
+    """Yield (line number, row dict) for a CSV body with a header row."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        for key in ('sizes', 'colors', 'categories'):
+            if row.get(key):
+                row[key] = [value.strip() for value in row[key].split(CSV_LIST_SEPARATOR) if value.strip()]
+            else:
+                row.pop(key, None)
+        yield reader.line_num, {key: value for key, value in row.items() if value not in (None, '')}
+
+
+def read_rows(binary_stream, content_type):
+    stream = io.TextIOWrapper(binary_stream, encoding='utf-8', newline='')
+    if 'csv' in content_type:
+        return csv_rows(stream)
+    return ndjson_rows(stream)
+
+
+def lookup_ids(model, refs):
+    """Map each id or name in refs to a primary key with one query."""
+    ids = {ref for ref in refs if isinstance(ref, int)}
+    names = {ref for ref in refs if isinstance(ref, str)}
+    if not ids and not names:
+        return {}
+    found = {}
+    for id, name in db.session.query(model.id, model.name).filter(or_(model.id.in_(ids), model.name.in_(names))):
+        found[id] = id
+        # Subcategory names repeat across categories; an ambiguous name resolves to None
+        found[name] = None if name in found and found[name] != id else id
+    return found
+
+
+def as_ref(value):
+    # CSV cells and loose JSON hand us ids as strings
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return value
+
+
+def as_flag(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in FLAG_VALUES:
+        return FLAG_VALUES[value.strip().lower()]
+    raise ValueError('featured must be true or false')
+
+
+def check_references(row):
+    """Reject category/subcategory refs that aren't ids or names before the
+    batch lookups put them in sets."""
+    if not isinstance(row.get('categories', []), list):
+        raise ValueError('categories must be a list')
+    refs = row.get('categories', []) + [row.get('subcategory_id', row.get('subcategory'))]
+    if any(isinstance(ref, bool) or not isinstance(ref, (int, str, type(None))) for ref in refs):
+        raise ValueError('categories and subcategory must be ids or names')
+
+
+def build_product(row, user_id, categories, subcategories):
+    # Every row gets the same keys so the whole batch is one executemany
+    values = {field: row.get(field) for field in PRODUCT_FIELDS}
+    values['subcategory_id'] = None
+    if not values['name']:
+        raise ValueError('name is required')
+    if values['price'] is None:
+        raise ValueError('price is required')
+    try:
+        values['price'] = float(values['price'])
+        values['inventory_count'] = int(values['inventory_count'] or 0)
+    except (TypeError, ValueError):
+        raise ValueError('price and inventory_count must be numbers')
+
+    subcategory = as_ref(row.get('subcategory_id', row.get('subcategory')))
+    if subcategory is not None:
+        if subcategories.get(subcategory) is None:
+            raise ValueError(f'Unknown or ambiguous subcategory {subcategory!r}')
+        values['subcategory_id'] = subcategories[subcategory]
+
+    category_ids = []
+    for ref in row.get('categories', []):
+        category_id = categories.get(as_ref(ref))
+        if category_id is None:
+            raise ValueError(f'Unknown category {ref!r}')
+        if category_id not in category_ids:
+            category_ids.append(category_id)
+
+    for key in ('sizes', 'colors'):
+        if not isinstance(row.get(key, []), list):
+            raise ValueError(f'{key} must be a list')
+
+    featured = as_flag(row.get('featured', False))
+
+    values['user_id'] = user_id
+    values['available_sizes'] = json.dumps(row['sizes']) if 'sizes' in row else None
+    values['available_colors'] = json.dumps(row['colors']) if 'colors' in row else None
+    return values, category_ids, featured
+
+
+def import_batch(batch, user_id, report):
+    rows = []
+    for line, row in batch:
+        if not isinstance(row, dict):
+            report['errors'].append({'row': line, 'error': row})
+            continue
+        try:
+            check_references(row)
+        except ValueError as e:
+            report['errors'].append({'row': line, 'error': str(e)})
+            continue
+        rows.append((line, row))
+
+    # Categories and subcategories are resolved once for the whole batch
+    categories = lookup_ids(Category, {as_ref(ref) for _, row in rows for ref in row.get('categories', [])})
+    subcategories = lookup_ids(Subcategory, {
+        as_ref(row.get('subcategory_id', row.get('subcategory'))) for _, row in rows
+    } - {None})
+
+    products, links, attributes, lines = [], [], [], []
+    for line, row in rows:
+        try:
+            values, category_ids, featured = build_product(row, user_id, categories, subcategories)
+        except ValueError as e:
+            report['errors'].append({'row': line, 'error': str(e)})
+            continue
+        products.append(values)
+        links.append((category_ids, featured))
+        attributes.append((row.get('sizes', []), row.get('colors', [])))
+        lines.append(line)
+    if not products:
+        return
+
+    try:
+        ids = db.session.execute(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True), products
+        ).scalars().all()
+        product_categories = [
+            {'product_id': product_id, 'category_id': category_id, 'featured': featured}
+            for product_id, (category_ids, featured) in zip(ids, links)
+            for category_id in category_ids
+        ]
+        if product_categories:
+            db.session.execute(insert(ProductCategory), product_categories)
+        product_attributes = [
+            attribute
+            for product_id, (sizes, colors) in zip(ids, attributes)
+            for attribute in attribute_rows(product_id, sizes, colors)
+        ]
+        if product_attributes:
+            db.session.execute(insert(ProductAttribute), product_attributes)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        report['errors'].extend({'row': line, 'error': str(e)} for line in lines)
+        return
+    report['inserted'] += len(ids)
+
+
+def read_batch(rows, batch_size):
+    """(up to batch_size rows, error) where error describes a body that
+    can't be read past the returned rows."""
+    batch = []
+    try:
+        for row in islice(rows, batch_size):
+            batch.append(row)
+    except UnicodeDecodeError:
+        return batch, 'Body is not valid UTF-8'
+    except csv.Error as e:
+        return batch, f'Malformed CSV: {e}'
+    return batch, None
+
+
+def import_products(rows, user_id, batch_size):
+    """Insert parsed rows in transactions of batch_size rows and return a
+    report of the inserted count and per-row errors. A body that stops
+    being readable ends the import with an 'error' in the report; the rows
+    before it are still imported."""
+    report = {'inserted': 0, 'errors': []}
+    rows = iter(rows)
+    last_line = 0
+    while True:
+        batch, error = read_batch(rows, batch_size)
+        if batch:
+            import_batch(batch, user_id, report)
+            last_line = batch[-1][0]
+        if error:
+            report['error'] = f'{error} after line {last_line}; the rest of the body was not imported'
+            break
+        if not batch:
+            break
+    return report
@@ -0,0 +1,151 @@
+#cProfile dumps of single live requests, on demand for admins and sampled
+#1 in N into a bounded rolling buffer. Dumps are pstats files: load them
+#with pstats, snakeviz or flameprof (flame graphs), or fetch ?format=text.
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import re
+import threading
+import time
+
+from flask import g, request
+
+from auth import is_admin_session
+from config import app
+from metrics import resource_name
+
+PROFILE_HEADER = 'X-Profile'
+
+# <time_ns>-<request|sample>-<Resource>-<METHOD>.prof
+NAME_PATTERN = re.compile(r'^\d+-(request|sample)-[\w.]+-[A-Z]+\.prof$')
+
+# Rows of the text report, by cumulative time
+TEXT_LINES = 60
+
+# Only one profiler can hook the interpreter at a time, so requests that
+# arrive while one is being profiled just run normally
+_profiling = threading.Lock()
+_requests_seen = itertools.count(1)
+
+
+class ProfileNotFound(LookupError):
+    pass
+
+
+def profile_kind():
+    """'request' when an admin asked for this one, 'sample' when it is the
+    Nth request, else None."""
+    if request.headers.get(PROFILE_HEADER) == '1' and is_admin_session():
+        return 'request'
+    every = app.config['PROFILE_SAMPLE_EVERY']
+    if every > 0 and next(_requests_seen) % every == 0:
+        return 'sample'
+    return None
+
+
+@app.before_request
+def start_profile():
+    kind = profile_kind()
+    if kind is None or not _profiling.acquire(blocking=False):
+        return
+    profiler = cProfile.Profile()
+    g.profile = (kind, profiler)
+    # An admin profiling a slow endpoint wants the handler, not a cache hit
+    g.bypass_cache = kind == 'request'
+    profiler.enable()
+
+
+@app.after_request
+def save_profile(response):
+    profile = stop_profile()
+    if profile is None:
+        return response
+    kind, profiler = profile
+    name = f'{time.time_ns()}-{kind}-{resource_name()}-{request.method}.prof'
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+    profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], name))
+    if kind == 'sample':
+        prune('sample', app.config['PROFILE_SAMPLE_MAX_FILES'], app.config['PROFILE_SAMPLE_MAX_BYTES'])
+    else:
+        prune('request', app.config['PROFILE_REQUEST_MAX_FILES'])
+        response.headers[PROFILE_HEADER] = name
+    return response
+
+
+@app.teardown_request
+def discard_profile(exc):
+    # after_request doesn't run when the response couldn't be built
+    stop_profile()
+
+
+def stop_profile():
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile[1].disable()
+        _profiling.release()
+    return profile
+
+
+def saved_profiles(kind=None):
+    """Saved dumps, oldest first, as dicts of name, kind, resource, method,
+    size and created (epoch seconds)."""
+    try:
+        names = os.listdir(app.config['PROFILE_DIR'])
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in sorted(names):
+        match = NAME_PATTERN.match(name)
+        if not match or kind not in (None, match.group(1)):
+            continue
+        try:
+            size = os.path.getsize(os.path.join(app.config['PROFILE_DIR'], name))
+        except FileNotFoundError:
+            continue  # pruned by another worker
+        stamp, _, resource, method = name[:-len('.prof')].split('-')
+        profiles.append({
+            'name': name,
+            'kind': match.group(1),
+            'resource': resource,
+            'method': method,
+            'size': size,
+            'created': int(stamp) / 1e9,
+        })
+    return profiles
+
+
+def prune(kind, max_files, max_bytes=None):
+    profiles = saved_profiles(kind)
+    total = sum(profile['size'] for profile in profiles)
+    while profiles and (len(profiles) > max_files or (max_bytes is not None and total > max_bytes)):
+        oldest = profiles.pop(0)
+        total -= oldest['size']
+        try:
+            os.remove(os.path.join(app.config['PROFILE_DIR'], oldest['name']))
+        except FileNotFoundError:
+            pass
+
+
+def load_stats(names):
+    """Merge the named dumps into one pstats.Stats."""
+    paths = []
+    for name in names:
+        path = os.path.join(app.config['PROFILE_DIR'], name)
+        if not NAME_PATTERN.match(name) or not os.path.exists(path):
+            raise ProfileNotFound(f'No profile named {name}')
+        paths.append(path)
+    return pstats.Stats(*paths, stream=io.StringIO())
+
+
+def render(stats, format):
+    """(body, mimetype) for a Stats in 'pstats' (the dump_stats file format)
+    or 'text' format."""
+    if format == 'text':
+        stats.sort_stats('cumulative').print_stats(TEXT_LINES)
+        return stats.stream.getvalue(), 'text/plain'
+    if format == 'pstats':
+        return marshal.dumps(stats.stats), 'application/octet-stream'
+    raise ValueError(f'Unknown format {format}; use pstats or text')
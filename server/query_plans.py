@@ -0,0 +1,103 @@
+#checks that endpoint SQL is served from indexes (flask check-query-plans)
+import re
+import sys
+
+from sqlalchemy import event
+
+from config import app, db
+from models import User
+from pagination import encode_cursor
+
+# (request path, tables the endpoint is expected to read in full)
+ENDPOINTS = [
+    ('/products', {'products'}),
+    ('/products?category=Tops', set()),
+    ('/products?subcategory=Shirts', set()),
+    ('/products?category=Tops&subcategory=Shirts', set()),
+    ('/products?search=shirt', set()),
+    ('/products?search=shirt&limit=5&cursor=' + encode_cursor([-1.0, 0]), set()),
+    ('/products?limit=5&cursor=' + encode_cursor([0]), set()),
+    ('/products?fields=name,price,image_url', {'products'}),
+    # the first page walks products in rowid order up to the limit
+    ('/products?limit=5&fields=name,category', {'products'}),
+    ('/products?size=M&color=Black&max_price=50', set()),
+    # sorted first pages walk the sort index in order up to the limit
+    ('/products?sort=price&limit=5', {'products'}),
+    ('/products?sort=newest&limit=5&cursor=' + encode_cursor(['2030-01-01T00:00:00', 0]), set()),
+    ('/products/facets', set()),
+    ('/products/facets?category=Tops', set()),
+    ('/products?ids=1,2,3', set()),
+    ('/products/1', set()),
+    ('/products/1?fields=name,subcategory', set()),
+    ('/categories', {'categories'}),
+    ('/categories/1', set()),
+    ('/categories/tree', {'categories', 'subcategories', 'product_categories'}),
+    ('/subcategories', {'subcategories'}),
+    ('/subcategories/1', set()),
+    ('/users', {'users'}),
+    ('/users/1', set()),
+    ('/me', set()),
+    ('/orders', set()),
+    ('/orders?limit=5', set()),
+]
+
+# SQLAlchemy aliases tables as <name>_<n> in eager loads
+ALIAS_SUFFIX = re.compile(r'_\d+$')
+
+
+def capture_statements(client, path):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        client.get(path)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def full_scans(statement, parameters):
+    with db.engine.connect() as conn:
+        plan = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        if not detail.startswith('SCAN ') or 'VIRTUAL TABLE' in detail or detail == 'SCAN CONSTANT ROW':
+            continue
+        scans.append((ALIAS_SUFFIX.sub('', detail.split()[1]), detail))
+    return scans
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans():
+    """Run EXPLAIN QUERY PLAN over every endpoint's SQL and fail on table scans."""
+    if db.engine.dialect.name != 'sqlite':
+        print('Query plan checks only run against SQLite.')
+        return
+
+    client = app.test_client()
+    with app.app_context():
+        user = User.query.order_by(User.id).first()
+    if user:
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+
+    failures = 0
+    for path, allowed in ENDPOINTS:
+        with app.app_context():
+            for statement, parameters in capture_statements(client, path):
+                for table, detail in full_scans(statement, parameters):
+                    if table in allowed:
+                        continue
+                    failures += 1
+                    print(f'FAIL {path}: {detail}')
+                    print(f'     {" ".join(statement.split())}')
+
+    if failures:
+        print(f'{failures} unindexed scan(s) found.')
+        sys.exit(1)
+    print(f'All {len(ENDPOINTS)} endpoints use indexed access paths.')
@@ -0,0 +1,74 @@
+#full text product search backed by the products_fts FTS5 index
+import re
+
+from sqlalchemy import Float, column, false, func, literal_column, table, text
+
+from config import app, db
+from models import Product
+
+# External content FTS5 table kept in sync with products by triggers
+# (see migration 403a037899eb)
+products_fts = table('products_fts', column('rowid'), column('products_fts'))
+
+# Name matches count for more than description matches when ranking
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def fts_enabled():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def match_expression(term):
+    # Quote every word so user input can't inject FTS5 query syntax,
+    # and prefix match the words so results update while typing
+    words = re.findall(r'\w+', term)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def ranks_search(term):
+    # Only the FTS5 path, and only for a term with words, has a rank
+    return fts_enabled() and bool(match_expression(term))
+
+
+def search_rank():
+    """bm25 relevance of the match search_products joined in, lower is
+    better. Typed as a float so keyset cursors can check it."""
+    return func.bm25(literal_column('products_fts'), NAME_WEIGHT, DESCRIPTION_WEIGHT, type_=Float).label('rank')
+
+
+def search_products(query, term, ranked=True):
+    """Restrict a Product query to rows matching term, best matches first
+    unless ranked is False."""
+    if not fts_enabled():
+        return query.filter(
+            Product.name.ilike(f'%{term}%') |
+            Product.description.ilike(f'%{term}%')
+        )
+
+    expression = match_expression(term)
+    if not expression:
+        # Nothing searchable in the term (only punctuation), so nothing matches
+        return query.filter(false())
+    query = query.join(products_fts, products_fts.c.rowid == Product.id).filter(
+        products_fts.c.products_fts.match(expression)
+    )
+    if ranked:
+        query = query.order_by(search_rank(), Product.id)
+    return query
+
+
+@app.cli.group()
+def search():
+    """Manage the product search index."""
+
+
+@search.command('rebuild')
+def rebuild_index():
+    """Rebuild products_fts from the products table."""
+    if not fts_enabled():
+        print('Full text index is only used with SQLite; nothing to rebuild.')
+        return
+    db.session.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    print('Search index rebuilt.')
@@ -1,10 +1,12 @@
 from app import app, db
-from models import User, Category, Subcategory, Product, ProductCategory, Order
+from models import User, Category, Subcategory, Product, ProductCategory, ProductAttribute, Order, OrderItem
 
 def seed_data():
     with app.app_context():
         # Clear existing data in reverse order to avoid foreign key constraint violations
+        OrderItem.query.delete()
         ProductCategory.query.delete()
+        ProductAttribute.query.delete()
         Product.query.delete()
         Subcategory.query.delete()
         Category.query.delete()
@@ -15,7 +17,8 @@ def seed_data():
         # Seed Admin User
         admin = User(
             username="admin",
-            email="admin@thriftstore.com"
+            email="admin@thriftstore.com",
+            is_admin=True
         )
         admin.password_hash = "adminpassword"
         db.session.add(admin)
@@ -193,14 +196,14 @@ def seed_data():
 
         for order in orders:
             if order.user_id == customers[0].id:
-                order.set_items([
-                    {"product_id": products[0].id, "name": products[0].name, "quantity": 1, "price": products[0].price},
-                    {"product_id": products[1].id, "name": products[1].name, "quantity": 1, "price": products[1].price}
-                ])
+                order.items = [
+                    OrderItem(product_id=products[0].id, quantity=1, unit_price=products[0].price),
+                    OrderItem(product_id=products[1].id, quantity=1, unit_price=products[1].price)
+                ]
             elif order.user_id == customers[1].id:
-                order.set_items([
-                    {"product_id": products[3].id, "name": products[3].name, "quantity": 1, "price": products[3].price}
-                ])
+                order.items = [
+                    OrderItem(product_id=products[3].id, quantity=1, unit_price=products[3].price)
+                ]
             db.session.add(order)
 
         # Commit all changes
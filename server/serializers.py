@@ -0,0 +1,148 @@
+#compact JSON output for the API, using orjson when it is installed
+import json
+import time
+
+from flask import make_response
+from sqlalchemy import select
+
+from config import api, db
+from instrumentation import add_serialize_time
+from models import Category, Product, ProductCategory, Subcategory
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class RawJSON:
+    """Text (str or bytes) that is already valid JSON, e.g. the
+    available_sizes column or a cached response body. orjson splices it
+    into the output as is; the stdlib fallback has to decode it first."""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def encode_default(obj):
+        if isinstance(obj, RawJSON):
+            return orjson.Fragment(obj.text)
+        raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+    def dumps(data):
+        return orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+else:
+    def encode_default(obj):
+        if isinstance(obj, RawJSON):
+            return json.loads(obj.text)
+        raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+    def dumps(data):
+        return json.dumps(data, default=encode_default, separators=(',', ':')).encode()
+
+
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    # Replaces Flask-RESTful's encoder, which pretty prints in debug mode
+    started = time.perf_counter()
+    body = dumps(data)
+    add_serialize_time(time.perf_counter() - started)
+    response = make_response(body, code)
+    response.headers.extend(headers or {})
+    return response
+
+
+# Product output key -> column, in Product.to_dict order. 'category' is a
+# list of names loaded separately.
+PRODUCT_COLUMNS = {
+    'id': Product.id,
+    'name': Product.name,
+    'description': Product.description,
+    'price': Product.price,
+    'inventory_count': Product.inventory_count,
+    'image_url': Product.image_url,
+    'available_sizes': Product.available_sizes,
+    'available_colors': Product.available_colors,
+    'user_id': Product.user_id,
+    'subcategory_id': Product.subcategory_id,
+    'category': None,
+    'subcategory': Subcategory.name,
+    'created_at': Product.created_at,
+}
+PRODUCT_FIELDS = tuple(PRODUCT_COLUMNS)
+
+EMPTY_LIST = RawJSON('[]')
+
+# Columns stored as JSON text go out without a decode/encode round trip
+CONVERTERS = {
+    'available_sizes': lambda value: RawJSON(value) if value else EMPTY_LIST,
+    'available_colors': lambda value: RawJSON(value) if value else EMPTY_LIST,
+    'created_at': lambda value: value.isoformat() if value else None,
+}
+
+# Ids per category lookup, well under SQLite's bound parameter limit
+CATEGORY_CHUNK_SIZE = 500
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def requested_fields(raw):
+    """Parse a ?fields=name,price list into PRODUCT_FIELDS order. id is always
+    included since cursors and category lookups key on it."""
+    if not raw:
+        return PRODUCT_FIELDS
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = names - set(PRODUCT_FIELDS)
+    if unknown:
+        raise FieldsError(f'Unknown field(s): {", ".join(sorted(unknown))}')
+    names.add('id')
+    return tuple(key for key in PRODUCT_FIELDS if key in names)
+
+
+def select_products(query, fields=PRODUCT_FIELDS):
+    """Turn a Product query into one selecting just the columns for fields,
+    labelled with their output keys. Filters, joins and ordering carry over."""
+    columns = [PRODUCT_COLUMNS[key].label(key) for key in fields if PRODUCT_COLUMNS[key] is not None]
+    query = query.with_entities(*columns)
+    if 'subcategory' in fields:
+        query = query.outerjoin(Subcategory, Subcategory.id == Product.subcategory_id)
+    return query
+
+
+def category_names(product_ids):
+    names = {}
+    for start in range(0, len(product_ids), CATEGORY_CHUNK_SIZE):
+        chunk = product_ids[start:start + CATEGORY_CHUNK_SIZE]
+        for product_id, name in db.session.execute(
+            select(ProductCategory.product_id, Category.name)
+            .join(Category, Category.id == ProductCategory.category_id)
+            .where(ProductCategory.product_id.in_(chunk))
+            .order_by(ProductCategory.id)
+        ):
+            names.setdefault(product_id, []).append(name)
+    return names
+
+
+def serialize_products(rows, fields=PRODUCT_FIELDS):
+    """Build product dicts from select_products() result rows."""
+    keys = [key for key in fields if PRODUCT_COLUMNS[key] is not None]
+    converters = [(key, CONVERTERS[key]) for key in keys if key in CONVERTERS]
+    items = []
+    for row in rows:
+        item = dict(zip(keys, row))
+        for key, convert in converters:
+            item[key] = convert(item[key])
+        items.append(item)
+
+    if 'category' in fields:
+        names = category_names([item['id'] for item in items])
+        for item in items:
+            item['category'] = names.get(item['id'], [])
+    return items
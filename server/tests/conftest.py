@@ -0,0 +1,38 @@
+#pytest fixtures (python -m pytest from server/): the app on a throwaway
+#SQLite database built by the migrations
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# config reads DATABASE_URL at import, so it is set before the app is loaded
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+
+from flask_migrate import upgrade  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from cache import response_cache  # noqa: E402
+from config import db  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    with flask_app.app_context():
+        upgrade(directory=os.path.join(SERVER_DIR, 'migrations'))
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    response_cache.clear()
+    return app.test_client()
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        yield db.session
@@ -0,0 +1,38 @@
+#admin rights are granted from the command line only and never listed publicly
+from models import User
+
+
+def test_registering_as_admin_grants_nothing(client, session):
+    response = client.post('/users', json={'username': 'admin', 'email': 'not-an-admin@example.com', 'password': 'pw'})
+    assert response.status_code == 201
+    assert 'is_admin' not in response.json
+    assert client.get('/me').json['is_admin'] is False
+    assert client.get('/export/users').status_code == 403
+
+
+def test_set_admin_grants_and_revokes(app, client, session):
+    user = User(username='promoted', email='promoted@example.com', _password_hash='x')
+    session.add(user)
+    session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+    assert client.get('/export/users').status_code == 403
+
+    result = app.test_cli_runner().invoke(args=['set-admin', 'promoted'])
+    assert result.exit_code == 0, result.output
+    assert client.get('/me').json['is_admin'] is True
+    assert client.get('/export/users').status_code == 200
+
+    app.test_cli_runner().invoke(args=['set-admin', 'promoted', '--revoke'])
+    assert client.get('/export/users').status_code == 403
+
+
+def test_users_list_leaves_out_is_admin(client, session):
+    users = client.get('/users').json
+    assert users and all('is_admin' not in user for user in users)
+
+
+def test_set_admin_rejects_unknown_users(app):
+    result = app.test_cli_runner().invoke(args=['set-admin', 'nobody-by-that-name'])
+    assert result.exit_code != 0
+    assert 'No user named' in result.output
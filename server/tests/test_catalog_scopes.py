@@ -0,0 +1,80 @@
+#checkouts only invalidate responses that show stock; the category tree is
+#rebuilt when categories, subcategories or product membership change
+from itertools import count
+
+import pytest
+from sqlalchemy import event
+
+from config import db
+from models import Category, Product, Subcategory, User
+
+
+_fixtures = count(1)
+
+
+@pytest.fixture
+def catalog(client, session):
+    n = next(_fixtures)
+    user = User(username=f'scopes{n}', email=f'scopes{n}@example.com', _password_hash='x')
+    category = Category(name=f'Scopes {n}', description='')
+    session.add_all([user, category])
+    session.flush()
+    subcategory = Subcategory(name='Scoped', category_id=category.id)
+    session.add(subcategory)
+    session.flush()
+    product = Product(name='Scoped tee', price=5, inventory_count=10, user_id=user.id, subcategory_id=subcategory.id)
+    session.add(product)
+    session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+    return {'product': product.id, 'subcategory': subcategory.id, 'user': user.id}
+
+
+def etag(client, path):
+    return client.get(path).headers['ETag']
+
+
+def statements_for(client, path):
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        client.get(path)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return statements
+
+
+def test_checkout_keeps_the_category_tree_cached(client, catalog):
+    tree = etag(client, '/categories/tree')
+    product = etag(client, f'/products/{catalog["product"]}')
+
+    response = client.post('/orders', json={'items': [{'product_id': catalog['product'], 'quantity': 2}]})
+    assert response.status_code == 201
+
+    assert etag(client, '/categories/tree') == tree
+    # Only the ETag lookup runs; the tree comes from the response cache
+    assert len(statements_for(client, '/categories/tree')) == 1
+    assert etag(client, f'/products/{catalog["product"]}') != product
+    assert client.get(f'/products/{catalog["product"]}').json['inventory_count'] == 8
+
+
+def test_new_product_refreshes_the_category_tree(client, session, catalog):
+    tree = etag(client, '/categories/tree')
+    listings = {path: etag(client, path) for path in ('/categories', '/subcategories')}
+
+    session.add(Product(name='Another', price=5, user_id=catalog['user'], subcategory_id=catalog['subcategory']))
+    session.commit()
+
+    assert etag(client, '/categories/tree') != tree
+    # The category and subcategory listings don't show product counts
+    assert {path: etag(client, path) for path in listings} == listings
+    counts = {
+        subcategory['id']: subcategory['product_count']
+        for category in client.get('/categories/tree').json
+        for subcategory in category['subcategories']
+    }
+    assert counts[catalog['subcategory']] == 2
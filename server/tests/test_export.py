@@ -0,0 +1,22 @@
+#exports stream in chunks without holding a connection between them
+from config import db
+from models import User
+
+
+def test_connection_is_released_between_chunks(app, client, session, monkeypatch):
+    admin = User(username='exporter', email='exporter@example.com', _password_hash='x', is_admin=True)
+    session.add_all([admin] + [User(username=f'exported{n}', email=f'exported{n}@example.com', _password_hash='x')
+                               for n in range(5)])
+    session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin.id
+    monkeypatch.setitem(app.config, 'EXPORT_CHUNK_SIZE', 2)
+
+    response = client.get('/export/users', buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    assert db.engine.pool.checkedout() == 0
+
+    rest = b''.join(chunks)
+    response.close()
+    assert len((first + rest).splitlines()) == User.query.count()
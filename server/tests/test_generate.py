@@ -0,0 +1,21 @@
+#flask generate versions what it inserts, so cached ETags don't survive it
+from models import TableVersion
+
+
+def test_generated_orders_bump_their_buyers_scopes(app, session):
+    runner = app.test_cli_runner()
+    counts = session.query(TableVersion.version).filter_by(scope='subcategory_counts').scalar() or 0
+    result = runner.invoke(args=['generate', '--users', '5', '--categories', '2', '--subcategories', '2',
+                                 '--products', '20', '--orders', '0'])
+    assert result.exit_code == 0, result.output
+    before = dict(session.query(TableVersion.scope, TableVersion.version))
+    # New products change the category tree's counts
+    assert before['subcategory_counts'] > counts
+
+    result = runner.invoke(args=['generate', '--users', '0', '--categories', '0', '--products', '0', '--orders', '50'])
+    assert result.exit_code == 0, result.output
+
+    after = dict(session.query(TableVersion.scope, TableVersion.version))
+    bumped = {scope for scope, version in after.items() if version > before.get(scope, 0)}
+    assert {scope for scope in bumped if scope.startswith('orders:')}
+    assert 'orders' in bumped
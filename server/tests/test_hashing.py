@@ -0,0 +1,50 @@
+#password hashing survives a dead pool child, and only rehashes logins
+#whose method or parameters differ from PASSWORD_HASH_METHOD
+import os
+import signal
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import hashing
+from models import User
+
+
+@pytest.mark.parametrize('method', ['scrypt', 'scrypt:32768:8:1', 'pbkdf2', 'pbkdf2:sha256', 'pbkdf2:sha256:1000000'])
+def test_hashes_made_with_the_configured_method_are_kept(app, monkeypatch, method):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_METHOD', method)
+    assert not hashing.needs_rehash(generate_password_hash('pw', method))
+
+
+@pytest.mark.parametrize('method, stored', [
+    ('scrypt', 'pbkdf2:sha256'),
+    ('scrypt:16384:8:1', 'scrypt'),
+    ('pbkdf2:sha256:1000000', 'pbkdf2:sha256:600000'),
+    ('pbkdf2:sha512', 'pbkdf2'),
+])
+def test_other_methods_and_parameters_are_rehashed(app, monkeypatch, method, stored):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_METHOD', method)
+    assert hashing.needs_rehash(generate_password_hash('pw', stored))
+
+
+def kill_pool_child():
+    pool = hashing.get_pool()
+    os.kill(next(iter(pool._processes)), signal.SIGKILL)
+    deadline = time.monotonic() + 5
+    while not pool._broken and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_dead_pool_child_answers_503_then_recovers(client, session):
+    user = User(username='hasher', email='hasher@example.com')
+    user.password_hash = 'pw'
+    session.add(user)
+    session.commit()
+
+    kill_pool_child()
+    response = client.post('/login', json={'username': 'hasher', 'password': 'pw'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    assert client.post('/login', json={'username': 'hasher', 'password': 'pw'}).status_code == 200
@@ -0,0 +1,43 @@
+#cursors are checked against their sort keys before they reach the SQL
+import base64
+import json
+
+import pytest
+
+from pagination import encode_cursor
+
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('path, values', [
+    ('/products?limit=2', [[1]]),
+    ('/products?limit=2', [{'id': 1}]),
+    ('/products?limit=2', ['1']),
+    ('/products?limit=2', [1.5]),
+    ('/products?limit=2', [True]),
+    ('/products?limit=2', [None]),
+    ('/products?limit=2&sort=price', [[10], 1]),
+    ('/products?limit=2&sort=price', ['10', 1]),
+    ('/products?limit=2&sort=newest', [{'at': 1}, 1]),
+    ('/products?limit=2&sort=newest', ['not a date', 1]),
+    ('/users?limit=2', [[1]]),
+])
+def test_malformed_cursor_values_are_rejected(client, path, values):
+    response = client.get(f'{path}&cursor={raw_cursor(values)}')
+
+    assert response.status_code == 400
+    assert response.json == {'error': 'Invalid cursor'}
+
+
+@pytest.mark.parametrize('path, values', [
+    ('/products?limit=2', [1]),
+    ('/products?limit=2&sort=price', [10, 1]),
+    ('/products?limit=2&sort=price', [10.5, 1]),
+    ('/products?limit=2&sort=newest', ['2025-01-01T00:00:00', 1]),
+])
+def test_well_typed_cursors_are_accepted(client, path, values):
+    response = client.get(f'{path}&cursor={encode_cursor(values)}')
+
+    assert response.status_code == 200
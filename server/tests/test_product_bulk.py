@@ -0,0 +1,129 @@
+#PATCH /products/bulk: per item results for ownership and validation, and
+#attribute/category links rewritten only where they changed
+from itertools import count
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+import product_bulk
+from config import db
+from models import Category, Product, ProductAttribute, ProductCategory, User
+
+
+_fixtures = count(1)
+
+
+@pytest.fixture
+def catalog(client, session):
+    n = next(_fixtures)
+    owner = User(username=f'bulk{n}', email=f'bulk{n}@example.com', _password_hash='x')
+    other = User(username=f'bulk-other{n}', email=f'bulk-other{n}@example.com', _password_hash='x')
+    tops = Category(name=f'Bulk tops {n}', description='')
+    sale = Category(name=f'Bulk sale {n}', description='')
+    session.add_all([owner, other, tops, sale])
+    session.flush()
+    mine = Product(name='Mine', price=5, inventory_count=1, user_id=owner.id, available_sizes='["S", "M"]')
+    theirs = Product(name='Theirs', price=5, inventory_count=1, user_id=other.id)
+    session.add_all([mine, theirs])
+    session.flush()
+    session.add_all([
+        ProductAttribute(product_id=mine.id, kind='size', value='S'),
+        ProductAttribute(product_id=mine.id, kind='size', value='M'),
+        ProductCategory(product_id=mine.id, category_id=tops.id, featured=True),
+    ])
+    session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = owner.id
+    return {'mine': mine.id, 'theirs': theirs.id, 'tops': tops.id, 'sale': sale.id}
+
+
+def patch(client, items):
+    response = client.patch('/products/bulk', json=items)
+    assert response.status_code == 200
+    return response.json
+
+
+def rows(statement):
+    return db.session.execute(statement).all()
+
+
+def test_other_users_and_missing_products_are_reported(client, session, catalog):
+    report = patch(client, [
+        {'id': catalog['theirs'], 'fields': {'price': 1}},
+        {'id': catalog['mine'], 'fields': {'price': 7}},
+        {'id': 10 ** 9, 'fields': {'price': 1}},
+    ])
+
+    assert [result['status'] for result in report['results']] == [403, 200, 404]
+    assert report['updated'] == 1
+    assert session.get(Product, catalog['theirs']).price == 5
+    assert session.get(Product, catalog['mine']).price == 7
+
+
+def test_only_changed_links_are_rewritten(client, session, catalog):
+    kept = rows(select(ProductAttribute.id).where(ProductAttribute.value == 'S',
+                                                  ProductAttribute.product_id == catalog['mine']))
+    link = rows(select(ProductCategory.id).where(ProductCategory.product_id == catalog['mine']))
+
+    report = patch(client, [{'id': catalog['mine'], 'fields': {
+        'sizes': ['S', 'L'],
+        'categories': [catalog['tops'], catalog['sale']],
+    }}])
+    assert report['updated'] == 1
+
+    sizes = rows(select(ProductAttribute.id, ProductAttribute.value)
+                 .where(ProductAttribute.product_id == catalog['mine'], ProductAttribute.kind == 'size'))
+    assert sorted(value for _, value in sizes) == ['L', 'S']
+    assert kept[0].id in {id for id, _ in sizes}
+    links = dict(rows(select(ProductCategory.category_id, ProductCategory.id)
+                      .where(ProductCategory.product_id == catalog['mine'])))
+    assert links[catalog['tops']] == link[0].id
+    # The kept link keeps its featured flag; the new one isn't featured
+    featured = dict(rows(select(ProductCategory.category_id, ProductCategory.featured)
+                         .where(ProductCategory.product_id == catalog['mine'])))
+    assert featured == {catalog['tops']: True, catalog['sale']: False}
+
+
+def test_featured_alone_updates_current_links(client, session, catalog):
+    patch(client, [{'id': catalog['mine'], 'fields': {'featured': False}}])
+
+    assert rows(select(ProductCategory.featured).where(ProductCategory.product_id == catalog['mine'])) == [(False,)]
+
+
+@pytest.mark.parametrize('fields', [
+    {'image_url': ['x']},
+    {'name': 5},
+    {'description': {'text': 'x'}},
+    {'price': 'nan'},
+    {'price': 'inf'},
+    {'inventory_count': float('inf')},
+    {'categories': [10 ** 9]},
+    {'colour': 'red'},
+])
+def test_bad_fields_fail_only_their_item(client, session, catalog, fields):
+    other = Product(name='Other', price=5, user_id=session.get(Product, catalog['mine']).user_id)
+    session.add(other)
+    session.commit()
+
+    report = patch(client, [
+        {'id': catalog['mine'], 'fields': fields},
+        {'id': other.id, 'fields': {'price': 8}},
+    ])
+
+    assert [result['status'] for result in report['results']] == [400, 200]
+    assert session.get(Product, other.id).price == 8
+
+
+def test_database_errors_are_not_returned(client, session, catalog, monkeypatch):
+    def fail(patches):
+        raise OperationalError('UPDATE products SET price=?', (7.0,), Exception('disk I/O error'))
+    monkeypatch.setattr(product_bulk, 'sync_categories', fail)
+
+    report = patch(client, [{'id': catalog['mine'], 'fields': {'price': 7}}])
+
+    result = report['results'][0]
+    assert result['status'] == 500
+    assert 'UPDATE' not in result['error'] and 'disk' not in result['error']
+    session.expire_all()
+    assert session.get(Product, catalog['mine']).price == 5
@@ -0,0 +1,89 @@
+#POST /products/import reports malformed rows instead of failing the batch
+import json
+
+import pytest
+
+from config import db
+from models import Category, ProductCategory, User
+
+
+@pytest.fixture
+def seller(client, session):
+    user = User(username='importer', email='importer@example.com', _password_hash='x')
+    session.add(user)
+    session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+    yield user.id
+    session.delete(db.session.get(User, user.id))
+    session.commit()
+
+
+def post_ndjson(client, rows):
+    body = '\n'.join(json.dumps(row) for row in rows)
+    return client.post('/products/import', data=body, content_type='application/x-ndjson')
+
+
+@pytest.mark.parametrize('bad', [
+    {'categories': [['x']]},
+    {'categories': [{'id': 1}]},
+    {'categories': 'Tops'},
+    {'subcategory': ['Shirts']},
+    {'subcategory_id': {'id': 1}},
+])
+def test_unusable_references_are_row_errors(client, seller, bad):
+    response = post_ndjson(client, [
+        {'name': 'Good', 'price': 5},
+        {'name': 'Bad', 'price': 5, **bad},
+    ])
+
+    assert response.status_code == 200
+    assert response.json['inserted'] == 1
+    assert [error['row'] for error in response.json['errors']] == [2]
+
+
+@pytest.mark.parametrize('cell, featured', [
+    ('true', True), ('1', True), ('Yes', True),
+    ('false', False), ('0', False), ('no', False),
+])
+def test_csv_featured_is_parsed(client, session, seller, cell, featured):
+    category = Category(name=f'Featured {cell}', description='')
+    session.add(category)
+    session.commit()
+    body = f'name,price,categories,featured\nFlagged,5,{category.id},{cell}\n'
+
+    response = client.post('/products/import', data=body, content_type='text/csv')
+
+    assert response.json['inserted'] == 1
+    link = ProductCategory.query.filter_by(category_id=category.id).one()
+    assert link.featured is featured
+
+
+def test_unknown_featured_value_is_a_row_error(client, seller):
+    response = client.post('/products/import', data='name,price,featured\nFlagged,5,maybe\n', content_type='text/csv')
+
+    assert response.json['inserted'] == 0
+    assert response.json['errors'] == [{'row': 2, 'error': 'featured must be true or false'}]
+
+
+def test_undecodable_body_keeps_earlier_batches(client, seller):
+    # The body is decoded a chunk at a time; rows are read up to the chunk
+    # holding the bad bytes
+    good = ''.join(json.dumps({'name': f'Readable {n}', 'price': 5}) + '\n' for n in range(500))
+    body = good.encode() + b'{"name": "\xff\xfe", "price": 5}\n'
+
+    response = client.post('/products/import?batch_size=100', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert 0 < response.json['inserted'] < 500
+    assert 'UTF-8' in response.json['error']
+
+
+def test_malformed_csv_is_a_stream_error(client, seller):
+    body = 'name,price\nShort,5\n' + 'x' * 200000 + ',5\n'
+
+    response = client.post('/products/import', data=body, content_type='text/csv')
+
+    assert response.status_code == 200
+    assert response.json['inserted'] == 1
+    assert response.json['error'].startswith('Malformed CSV')
@@ -0,0 +1,61 @@
+#GET /products must cost a fixed number of SQL statements, however many
+#products it returns (no per-product category/subcategory lookups)
+from itertools import count as counter
+
+import pytest
+from sqlalchemy import event, insert
+
+from cache import response_cache
+from config import db
+from models import Category, Product, ProductCategory, Subcategory, User
+
+
+_batches = counter(1)
+
+
+def add_products(session, count):
+    # Each batch brings its own seller, category and subcategory
+    batch = next(_batches)
+    user = session.execute(insert(User).returning(User.id), [
+        {'username': f'listing{batch}', 'email': f'listing{batch}@example.com', '_password_hash': 'x'},
+    ]).scalar_one()
+    category = session.execute(insert(Category).returning(Category.id), [
+        {'name': f'Listing category {batch}', 'description': ''},
+    ]).scalar_one()
+    subcategory = session.execute(insert(Subcategory).returning(Subcategory.id), [
+        {'name': f'Listing subcategory {batch}', 'category_id': category},
+    ]).scalar_one()
+    ids = session.execute(insert(Product).returning(Product.id, sort_by_parameter_order=True), [
+        {'name': f'Product {i}', 'price': 10.0, 'user_id': user, 'subcategory_id': subcategory}
+        for i in range(count)
+    ]).scalars().all()
+    session.execute(insert(ProductCategory), [
+        {'product_id': id, 'category_id': category, 'featured': False} for id in ids
+    ])
+    session.commit()
+
+
+def statements_for(client, path):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    response_cache.clear()
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return statements
+
+
+@pytest.mark.parametrize('path', ['/products', '/products?limit=500'])
+def test_listing_statement_count_does_not_grow_with_products(client, session, path):
+    add_products(session, 50)
+    few = statements_for(client, path)
+    add_products(session, 50)
+    many = statements_for(client, path)
+
+    assert len(many) == len(few), '\n'.join(many)
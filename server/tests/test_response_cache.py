@@ -0,0 +1,56 @@
+#cached catalog responses follow writes committed by other processes, which
+#only show up in table_versions
+import sqlite3
+from itertools import count
+
+import pytest
+
+from config import db
+from models import Product, User
+
+
+_fixtures = count(1)
+
+
+@pytest.fixture
+def product(client, session):
+    n = next(_fixtures)
+    user = User(username=f'cached{n}', email=f'cached{n}@example.com', _password_hash='x')
+    session.add(user)
+    session.flush()
+    product = Product(name='Cached tee', price=5, inventory_count=10, user_id=user.id)
+    session.add(product)
+    session.commit()
+    return product.id
+
+
+def write_elsewhere(statement, *params):
+    # A separate connection, as another worker process would use
+    connection = sqlite3.connect(db.engine.url.database)
+    with connection:
+        connection.execute(statement, params)
+        connection.execute("UPDATE table_versions SET version = version + 1 WHERE scope = 'products'")
+    connection.close()
+
+
+def test_another_workers_write_replaces_the_cached_product(client, product):
+    first = client.get(f'/products/{product}')
+    assert first.json['price'] == 5.0
+
+    write_elsewhere('UPDATE products SET price = 7 WHERE id = ?', product)
+
+    second = client.get(f'/products/{product}')
+    assert second.json['price'] == 7.0
+    assert second.headers['ETag'] != first.headers['ETag']
+
+    revalidated = client.get(f'/products/{product}', headers={'If-None-Match': second.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_another_workers_write_replaces_cached_multi_get_entries(client, product):
+    assert client.get(f'/products?ids={product}').json['products'][str(product)]['price'] == 5.0
+
+    write_elsewhere('UPDATE products SET price = 9 WHERE id = ?', product)
+
+    assert client.get(f'/products?ids={product}').json['products'][str(product)]['price'] == 9.0
+    assert client.get(f'/products/{product}').json['price'] == 9.0
@@ -0,0 +1,41 @@
+#search results stay in relevance order across keyset pages
+from models import Product, User
+
+
+def test_search_pages_follow_relevance(client, session):
+    user = User(username='searcher', email='searcher@example.com', _password_hash='x')
+    session.add(user)
+    session.flush()
+    # Name matches outrank description matches, and ids run the other way
+    session.add_all([
+        Product(name='Plain tee', description='goes with any zephyr jacket', price=5, user_id=user.id),
+        Product(name='Zephyr tee', description='light', price=5, user_id=user.id),
+        Product(name='Zephyr zephyr', description='zephyr', price=5, user_id=user.id),
+    ])
+    session.commit()
+
+    ranked = [product['id'] for product in client.get('/products?search=zephyr').json]
+    assert ranked != sorted(ranked)
+
+    paged, cursor = [], None
+    while True:
+        path = '/products?search=zephyr&limit=1' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(path).json
+        paged += [product['id'] for product in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert paged == ranked
+
+
+def test_term_without_words_matches_nothing(client, session):
+    user = User(username='punctuation', email='punctuation@example.com', _password_hash='x')
+    session.add(user)
+    session.flush()
+    session.add(Product(name='Bang tee', description='!!!', price=5, user_id=user.id))
+    session.commit()
+
+    for term in ('!!!', '%22'):
+        assert client.get(f'/products?search={term}').json == []
+        assert client.get(f'/products?search={term}&limit=5').json['items'] == []
@@ -0,0 +1,33 @@
+#the session user cache never holds on to a missing or outdated user
+from sqlalchemy import func, select
+
+from models import User
+
+
+def next_user_id(session):
+    return (session.scalar(select(func.max(User.id))) or 0) + 1
+
+
+def test_probed_id_is_not_cached_as_missing(client, session):
+    user_id = next_user_id(session)
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    assert client.get('/me').status_code == 404
+
+    response = client.post('/users', json={'username': 'latecomer', 'email': 'latecomer@example.com', 'password': 'pw'})
+    assert response.json['id'] == user_id
+
+    assert client.get('/me').json['username'] == 'latecomer'
+
+
+def test_edits_are_seen_by_me(client, session):
+    user = User(username='editor', email='editor@example.com', _password_hash='x')
+    session.add(user)
+    session.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+    assert client.get('/me').json['address'] is None
+
+    client.patch(f'/users/{user.id}', json={'address': '1 New Street'})
+
+    assert client.get('/me').json['address'] == '1 New Street'
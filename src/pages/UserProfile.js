@@ -92,7 +92,7 @@ const UserProfile = () => {
               <ul>
                 {order.items.map((item, index) => (
                   <li key={index}>
-                    Product ID: {item.product_id}, Quantity: {item.quantity}, Price: ${item.price_at_purchase}, Size: {item.size}, Color: {item.color}
+                    Product ID: {item.product_id}, Quantity: {item.quantity}, Price: ${item.unit_price}, Size: {item.size}, Color: {item.color}
                   </li>
                 ))}
               </ul>